@@ -0,0 +1,91 @@
+"""Измеряет накладные расходы клиента на один вызов метода без сети:
+доступ к vk.api.<method>, подготовку параметров, подпись и разбор ответа.
+Прежняя реализация (разбор пути и двойное кодирование параметров при
+каждом вызове, новые объекты Api при каждом обращении) воспроизведена
+здесь для сравнения.
+
+    $ python benchmarks/bench_call_overhead.py
+"""
+import hashlib
+import os
+import re
+import sys
+import timeit
+import urllib.parse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vkapi import Client, defaults  # noqa: E402
+from vkapi.client import API_METHOD_REGEXP, Api  # noqa: E402
+from vkapi.ratelimit import RateLimiter  # noqa: E402
+from vkapi.transports import Response, Transport  # noqa: E402
+
+RESPONSE = Response(
+    200, {}, b'{"response": [{"id": 1, "first_name": "Pavel"}]}')
+
+
+class FakeTransport(Transport):
+    """Транспорт, который сразу возвращает готовый ответ."""
+    def request(self, method, url, **kwargs):
+        return RESPONSE
+
+
+class LegacyApi(Api):
+    def __getattr__(self, name):
+        if API_METHOD_REGEXP.match(name):
+            method = name if not self._method \
+                             else '.'.join([self._method, name])
+            return self.__class__(self._client, method)
+        raise AttributeError(name)
+
+
+class LegacyClient(Client):
+    def create_api(self):
+        return LegacyApi(self)
+
+    def prepare_api_request(self, method, params):
+        q = dict(self.api_params)
+        q.update(params)
+        params = q
+        params['v'] = self.api_version
+        if self.access_token:
+            params['access_token'] = self.access_token
+        path = re.sub('^(/|)|(/|)$', '/', defaults.API_PATH)
+        path = urllib.parse.urljoin(path, method)
+        if self.secret_token:
+            params['sig'] = ''
+            query = urllib.parse.urlencode(params)
+            query = re.sub('^sig=&|&sig=', '', query)
+            uri = '{}?{}{}'.format(path, query, self.secret_token)
+            sig = hashlib.md5(uri.encode('ascii')).hexdigest()
+            params["sig"] = sig
+            scheme = 'http'
+        else:
+            scheme = 'https'
+        api_endpoint = "{}://{}{}".format(scheme, defaults.API_HOST, path)
+        return api_endpoint, params
+
+
+def make_client(cls, secret_token):
+    return cls(access_token='a' * 85, secret_token=secret_token,
+               rate_limiter=RateLimiter(1e9, burst=1e9),
+               transport=FakeTransport())
+
+
+def main(number=20000):
+    print("{:<20}{:>12}{:>12}{:>10}".format(
+        "", "legacy", "current", "speedup"))
+    for name, secret_token in [('https', None), ('nohttps + sig', 's' * 18)]:
+        results = []
+        for cls in (LegacyClient, Client):
+            vk = make_client(cls, secret_token)
+            results.append(min(timeit.repeat(
+                lambda: vk.api.users.get(user_ids=1, fields='sex'),
+                number=number, repeat=5)) / number)
+        print("{:<20}{:10.2f}us{:10.2f}us{:9.2f}x".format(
+            name, results[0] * 1e6, results[1] * 1e6,
+            results[0] / results[1]))
+
+
+if __name__ == '__main__':
+    main()
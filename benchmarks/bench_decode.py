@@ -0,0 +1,66 @@
+"""Сравнивает скорость декодирования большого ответа friends.get с полями:
+прежний способ (object_hook=AttrDict) и LazyDecoder с разными модулями JSON.
+
+    $ python benchmarks/bench_decode.py
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vkapi import decoders  # noqa: E402
+
+
+def make_response(count=1000):
+    items = []
+    for i in range(count):
+        items.append({
+            'id': i,
+            'first_name': 'Имя{}'.format(i),
+            'last_name': 'Фамилия{}'.format(i),
+            'sex': i % 2 + 1,
+            'bdate': '1.1.1990',
+            'city': {'id': 1, 'title': 'Москва'},
+            'country': {'id': 1, 'title': 'Россия'},
+            'photo_100': 'https://pp.vk.me/c1/v1/{}/abc.jpg'.format(i),
+            'online': 0,
+            'last_seen': {'time': 1450000000 + i, 'platform': 7},
+            'counters': {'albums': 1, 'videos': 2, 'audios': 3, 'photos': 4,
+                         'friends': 5, 'followers': 6, 'pages': 7},
+            'occupation': {'type': 'work', 'id': 1, 'name': 'Компания'},
+        })
+    data = {'response': {'count': count, 'items': items}}
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+def run(decoder, data):
+    # Типичная обработка: читаем поля верхнего уровня каждого элемента
+    for user in decoder.decode(data).response['items']:
+        user.first_name, user.last_name
+
+
+def main(number=20):
+    data = make_response()
+    variants = [('AttrDict object_hook', decoders.AttrDictDecoder()),
+                ('LazyDecoder json', decoders.LazyDecoder(json.loads))]
+    if decoders.ujson is not None:
+        variants.append(('LazyDecoder ujson',
+                         decoders.LazyDecoder(decoders.ujson.loads)))
+    if decoders.orjson is not None:
+        variants.append(('LazyDecoder orjson',
+                         decoders.LazyDecoder(decoders.orjson.loads)))
+    print("Response size: {:.1f}KB".format(len(data) / 1024))
+    print("{:<24}{:>10}{:>14}".format("", "decode", "decode+read"))
+    for name, decoder in variants:
+        decode = min(timeit.repeat(
+            lambda: decoder.decode(data), number=number, repeat=3)) / number
+        full = min(timeit.repeat(
+            lambda: run(decoder, data), number=number, repeat=3)) / number
+        print("{:<24}{:8.2f}ms{:12.2f}ms".format(
+            name, decode * 1000, full * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Замеряет время импорта vkapi и проверяет, что для работы с Api не
+загружаются PyQt5 и ресурсы.
+
+    $ python benchmarks/bench_import.py
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Импорт без GUI должен укладываться в это время
+MAX_IMPORT_TIME = 0.5
+HEAVY_MODULES = ['PyQt5', 'vkapi.auths', 'vkapi.browser', 'vkapi.dialogs',
+                 'vkapi.resources_rc', 'vkapi.ui_auth', 'vkapi.ui_captcha']
+
+CODE = """
+import sys, time
+start = time.perf_counter()
+import vkapi
+vk = vkapi.Client(access_token='x')
+print(time.perf_counter() - start)
+print(' '.join(sorted(m for m in {heavy!r} if m in sys.modules)))
+"""
+
+
+def measure(repeat=5):
+    times = []
+    loaded = set()
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, '-c', CODE.format(heavy=HEAVY_MODULES)],
+            cwd=ROOT, universal_newlines=True)
+        elapsed, modules = (output.splitlines() + [''])[:2]
+        times.append(float(elapsed))
+        loaded.update(modules.split())
+    return min(times), sorted(loaded)
+
+
+if __name__ == '__main__':
+    elapsed, loaded = measure()
+    print("import vkapi + Client(): {:.1f}ms".format(elapsed * 1000))
+    if loaded:
+        print("GUI modules loaded:", ', '.join(loaded))
+    if loaded or elapsed > MAX_IMPORT_TIME:
+        sys.exit(1)
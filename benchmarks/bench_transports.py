@@ -0,0 +1,123 @@
+"""Сравнивает транспорты на локальном сервере, который отвечает как Api:
+последовательные вызовы (накладные расходы на запрос) и вызовы из
+нескольких потоков или задач (работа пула соединений).
+
+Сервер запускается в отдельном процессе, чтобы не делить GIL с клиентом.
+
+    $ python benchmarks/bench_transports.py
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vkapi import Client, defaults  # noqa: E402
+from vkapi.ratelimit import RateLimiter  # noqa: E402
+from vkapi.retry import RetryPolicy  # noqa: E402
+from vkapi.transports import RequestsTransport, Urllib3Transport  # noqa
+
+RESPONSE = json.dumps({'response': [{
+    'id': 1, 'first_name': 'Pavel', 'last_name': 'Durov'}]}).encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Заголовки и тело пишутся отдельно, без этого каждый ответ ждал бы
+    # delayed ACK клиента
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+
+def serve(queue):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def make_client(cls, transport=None):
+    # С secret_token запросы отправляются по http
+    return cls(access_token='a' * 85, secret_token='s' * 18,
+               transport=transport,
+               rate_limiter=RateLimiter(1e9, burst=1e9),
+               retry_policy=RetryPolicy(retries=0))
+
+
+def call(vk):
+    return vk.api.users.get(user_ids=1)
+
+
+def bench_sync(transport, number, threads):
+    vk = make_client(Client, transport)
+    call(vk)
+    start = time.perf_counter()
+    for _ in range(number):
+        call(vk)
+    sequential = time.perf_counter() - start
+    with ThreadPoolExecutor(threads) as executor:
+        start = time.perf_counter()
+        list(executor.map(lambda _: call(vk), range(number)))
+        concurrent = time.perf_counter() - start
+    transport.close()
+    return sequential, concurrent
+
+
+async def bench_async(number, threads):
+    from vkapi.aio import AsyncClient
+    async with make_client(AsyncClient) as vk:
+        await call(vk)
+        start = time.perf_counter()
+        for _ in range(number):
+            await call(vk)
+        sequential = time.perf_counter() - start
+        semaphore = asyncio.Semaphore(threads)
+
+        async def limited():
+            async with semaphore:
+                await call(vk)
+        start = time.perf_counter()
+        await asyncio.gather(*(limited() for _ in range(number)))
+        concurrent = time.perf_counter() - start
+    return sequential, concurrent
+
+
+def main(number=2000, threads=8):
+    queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(queue,), daemon=True)
+    server.start()
+    defaults.API_HOST = '127.0.0.1:{}'.format(queue.get())
+    results = [
+        ('requests', bench_sync(
+            RequestsTransport(pool_size=threads), number, threads)),
+        ('urllib3', bench_sync(
+            Urllib3Transport(pool_size=threads), number, threads)),
+    ]
+    try:
+        results.append(('aiohttp', asyncio.run(bench_async(number, threads))))
+    except (ImportError, RuntimeError) as e:
+        print("aiohttp skipped: {}".format(e))
+    print("{} calls, {} threads/tasks".format(number, threads))
+    print("{:<12}{:>16}{:>16}".format("", "sequential", "concurrent"))
+    for name, (sequential, concurrent) in results:
+        print("{:<12}{:12.1f}us/op{:12.1f}us/op".format(
+            name, sequential / number * 1e6, concurrent / number * 1e6))
+    server.terminate()
+
+
+if __name__ == '__main__':
+    main()
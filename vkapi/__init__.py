@@ -2,7 +2,23 @@
 # пуст). Для обычных смертных все нужно вручную делать.
 from . import defaults
 from . import errors
-from .auths import AuthDirect, AuthStandalone
 from .datatypes import AttrDict
 from .client import Client, ClientError, ApiError
 from .permissions import Permissions
+from .pool import ClientPool
+
+# Формы авторизации тянут за собой PyQt5, QtWebKit и ресурсы, поэтому
+# импортируются только при обращении к ним
+_LAZY_ATTRS = {
+    'AuthDirect': 'auths',
+    'AuthStandalone': 'auths',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        import importlib
+        module = importlib.import_module('.' + _LAZY_ATTRS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(
+        "module {!r} has no attribute {!r}".format(__name__, name))
@@ -0,0 +1,611 @@
+"""Асинхронный клиент на основе asyncio и aiohttp.
+
+Usage::
+    >> import asyncio
+    >> from vkapi.aio import AsyncClient
+    >> async def main():
+    ..     async with AsyncClient(access_token=token) as vk:
+    ..         users = await vk.api.users.get(user_id=100)
+    ..         print(users[0].first_name)
+    >> asyncio.get_event_loop().run_until_complete(main())
+
+Авторизация через диалоги (AuthDirect, AuthStandalone) требует
+синхронного :class:`vkapi.client.Client`, полученный токен можно
+передать в конструктор AsyncClient.
+"""
+from . import defaults
+from .batch import AutoBatcher, Batch, MAX_CALLS
+from .cache import MISSING
+from .client import Api, ApiError, Client, ClientError
+from .datatypes import wrap
+from .downloads import Downloader
+from .images import read_image
+from .methods import is_public
+from .multipart import MultipartEncoder
+from .paging import BulkPager, Pager
+from .pool import ClientPool
+from .records import convert
+from .streaming import StreamParser
+from .uploads import Uploader
+from .transports import AiohttpTransport, TransportError
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import inspect
+import os
+import time
+import urllib.request
+
+
+class AsyncClient(Client):
+    """Клиент, методы которого возвращают корутины.
+
+    Частота запросов ограничивается так же, как и в
+    :class:`vkapi.client.Client`, но запросы не ждут ответов друг друга:
+    каждый вызов резервирует себе время отправки, поэтому одновременно может
+    выполняться столько запросов, сколько разрешает ограничитель.
+    """
+    def create_api(self):
+        return AsyncApi(self)
+
+    def create_transport(self, http=None):
+        return AiohttpTransport()
+
+    async def request(self, method, url, headers=None, **kwargs):
+        start_time = time.time()
+        response = await self.transport.request(
+            method, url, headers=self.merge_headers(headers), **kwargs)
+        self.check_status(response, url)
+        data = self.decoder.decode(response.content)
+        request_time = (time.time() - start_time) * 1000
+        self.logger.debug("Total Request Time: %dms", request_time)
+        return data
+
+    async def api_request(self, method, params={}):
+        """Асинхронный аналог :meth:`vkapi.client.Client.api_request`."""
+        if self.cache is not None and self.cache.cacheable(method, params):
+            return await self.cached_api_request(method, params)
+        return await self.perform_api_request(method, params)
+
+    async def api_stream(self, method, params={}, chunk_size=64 * 1024):
+        """Асинхронный аналог :meth:`vkapi.client.Client.api_stream`."""
+        attempt = 0
+        waited = 0
+        while True:
+            started = False
+            try:
+                async for item in self.send_api_stream(
+                        method, params, chunk_size):
+                    started = True
+                    yield item
+                return
+            except (ApiError,) + self.TRANSPORT_ERRORS as e:
+                if started:
+                    raise
+                delay = self.retry_policy.next_delay(
+                    method, e, attempt, waited)
+                if delay is None:
+                    raise
+                self.logger.warning(
+                    "Retrying %r in %.2fs after error: %s", method, delay, e)
+            await asyncio.sleep(delay)
+            attempt += 1
+            waited += delay
+
+    async def send_api_stream(self, method, params, chunk_size):
+        api_endpoint, params = self.prepare_api_request(method, params)
+        self.logger.debug(
+            "Streaming Api method %r with parameters: %s", method, params)
+        async with self.rate_limiter.slot(self.access_token):
+            response = await self.transport.request(
+                'POST', api_endpoint, data=params, headers=self.headers,
+                stream=True)
+        self.check_status(response, api_endpoint)
+        parser = StreamParser()
+        try:
+            async for chunk in response.iter_content(chunk_size):
+                for item in parser.feed(chunk):
+                    yield item
+                if parser.done:
+                    break
+            else:
+                for item in parser.close():
+                    yield item
+        finally:
+            response.close()
+        self.rate_feedback(wrap({'error': parser.error}))
+        if parser.error:
+            result = await self.process_api_response(
+                wrap({'error': parser.error}), method, params)
+            if isinstance(result, dict):
+                result = result.get('items', [])
+            for item in result:
+                yield item
+
+    async def cached_api_request(self, method, params):
+        key_params = dict(self.api_params, v=self.api_version,
+                          access_token=self.access_token)
+        key_params.update(params)
+        result = self.cache.lookup(method, key_params)
+        if result is MISSING:
+            result = await self.perform_api_request(method, params)
+            self.cache.store(method, key_params, result)
+        return result
+
+    async def perform_api_request(self, method, params):
+        attempt = 0
+        waited = 0
+        while True:
+            try:
+                response, sent_params = await self.send_api_request(
+                    method, params)
+                result = await self.process_api_response(
+                    response, method, sent_params)
+            except (ApiError,) + self.TRANSPORT_ERRORS as e:
+                delay = self.retry_policy.next_delay(
+                    method, e, attempt, waited)
+                if delay is None:
+                    raise
+                self.logger.warning(
+                    "Retrying %r in %.2fs after error: %s", method, delay, e)
+            else:
+                return result
+            await asyncio.sleep(delay)
+            attempt += 1
+            waited += delay
+
+    async def send_api_request(self, method, params):
+        api_endpoint, params = self.prepare_api_request(method, params)
+        self.logger.debug(
+            "Calling Api method %r with parameters: %s", method, params)
+        async with self.rate_limiter.slot(self.access_token):
+            response = await self.post(api_endpoint, params)
+        self.rate_feedback(response)
+        return response, params
+
+    async def process_api_response(self, response, method, params):
+        result = super().process_api_response(response, method, params)
+        # Обработчики ошибок являются корутинами
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    # Объединение запросов в execute
+
+    def batch(self, max_calls=None):
+        """Асинхронный аналог :meth:`vkapi.client.Client.batch`.
+
+        Usage::
+            >> async with vk.batch():
+            ..     a = vk.api.users.get(user_ids=1)
+            ..     b = vk.api.groups.getById(group_id=1)
+            >> print((await a)[0].first_name, (await b)[0].name)
+        """
+        return AsyncBatch(self, max_calls or MAX_CALLS)
+
+    def create_batcher(self):
+        return AsyncAutoBatcher(self, self.batch_window)
+
+    # Обработчики ошибок
+
+    async def handle_captcha(self, captcha_img, captcha_sid, method, params):
+        # Диалог модальный и блокирует event loop пока пользователь вводит
+        # капчу
+        params['captcha_sid'] = captcha_sid
+        params['captcha_key'] = self.ask_captcha(captcha_img)
+        return await self.api_request(method, params)
+
+    async def handle_validation(self, redirect_uri, method, params):
+        self.validate(redirect_uri)
+        return await self.api_request(method, params)
+
+    async def handle_error(self, error, method, params):
+        """Обработчик всех ошибок кроме капчи и валидации"""
+        raise error
+
+    def fetch_captcha_image(self, captcha_img):
+        # Вызывается из диалога капчи, который работает синхронно
+        with urllib.request.urlopen(captcha_img) as response:
+            return response.read()
+
+    # Загрузка файлов
+
+    async def upload(self, upload_url, files, progress=None):
+        """Асинхронный аналог :meth:`vkapi.client.Client.upload`."""
+        with MultipartEncoder(files, callback=progress) as encoder:
+            response = await self.post(upload_url, data=encoder, headers={
+                'Content-Type': encoder.content_type,
+                'Content-Length': str(len(encoder)),
+            })
+        if 'error' in response:
+            raise ClientError(response.error)
+        return response
+
+    # Соединения
+
+    async def warmup(self, n_connections=1, keep_alive_interval=None):
+        """Асинхронный аналог :meth:`vkapi.client.Client.warmup`. Проверка
+        соединений выполняется в задаче, которая отменяется в
+        :meth:`close`."""
+        url = '{}://{}/'.format(self.api_scheme, defaults.API_HOST)
+        opened = await self.transport.warmup(url, n_connections)
+        if keep_alive_interval:
+            self.stop_keep_alive()
+            self.pinger = asyncio.ensure_future(self.keep_alive(
+                url, n_connections, keep_alive_interval))
+        return opened
+
+    async def keep_alive(self, url, n_connections, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.transport.warmup(url, n_connections, True)
+            except TransportError as e:
+                self.logger.warning("Keep-alive ping failed: %s", e)
+
+    def stop_keep_alive(self):
+        if self.pinger is not None:
+            self.pinger.cancel()
+            self.pinger = None
+
+    # Работа с токеном
+
+    @property
+    async def test_token(self):
+        """Проверяет access_token."""
+        try:
+            return await self.api.execute(code="return true;")
+        except ApiError:
+            return False
+
+    # Закрытие соединений
+
+    async def close(self):
+        self.stop_keep_alive()
+        if self.owns_transport:
+            await self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class AsyncBatch(Batch):
+    """Батч для :class:`AsyncClient`. Вызовы внутри блока возвращают
+    :class:`asyncio.Future`."""
+    async def __aenter__(self):
+        self.activate()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.deactivate()
+        if exc_type is None:
+            await self.flush()
+        else:
+            self.cancel()
+
+    def create_future(self):
+        return asyncio.get_event_loop().create_future()
+
+    async def flush(self):
+        while self.calls:
+            await self.execute(self.pop_chunk())
+
+    async def execute(self, chunk):
+        try:
+            response, params = await self.client.send_api_request(
+                'execute', {'code': self.compile(chunk)})
+            if 'error' in response:
+                result = await self.client.process_api_response(
+                    response, 'execute', params)
+                errors = None
+            else:
+                result = response.response
+                errors = response.get('execute_errors')
+        except Exception as e:
+            for _, _, future in chunk:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.resolve(chunk, result, errors)
+
+
+class AsyncAutoBatcher(AutoBatcher):
+    """Объединяет вызовы из разных задач, сделанные в течение `window`
+    секунд, в один execute."""
+    async def call(self, method, params):
+        if self.pending is None:
+            self.pending = AsyncBatch(self.client, self.max_calls)
+            asyncio.get_event_loop().call_later(
+                self.window, self.schedule_flush, self.pending)
+        batch = self.pending
+        future = batch.add(method, params)
+        if len(batch) >= self.max_calls:
+            self.pending = None
+            await batch.flush()
+        return await future
+
+    def schedule_flush(self, batch):
+        if self.pending is batch:
+            self.pending = None
+            asyncio.ensure_future(batch.flush())
+
+
+class AsyncClientPool(ClientPool):
+    """Пул асинхронных клиентов, см. :class:`vkapi.pool.ClientPool`."""
+    def create_api(self):
+        return AsyncApi(self)
+
+    async def api_request(self, method, params={}):
+        while True:
+            client = self.choose(method, params)
+            try:
+                return await client.api_request(method, params)
+            except ApiError as e:
+                if not self.should_evict(e):
+                    raise
+                self.evict(client)
+                # Публичный метод повторяется через другого клиента, даже
+                # если недействителен токен владельца
+                if client is self.owner and not is_public(method, params):
+                    raise
+            finally:
+                self.release(client)
+
+    async def api_stream(self, method, params={}, chunk_size=64 * 1024):
+        client = self.choose(method, params)
+        try:
+            async for item in client.api_stream(method, params, chunk_size):
+                yield item
+        finally:
+            self.release(client)
+
+
+class AsyncUploader(Uploader):
+    """Асинхронный аналог :class:`vkapi.uploads.Uploader`: файлы
+    отправляются в parallel задачах."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = asyncio.Lock()
+
+    async def get_upload_url(self):
+        async with self.lock:
+            if self.url is None or self.clock() >= self.url_expires:
+                server = await self.client.api_request(
+                    self.kind.server_method,
+                    self.pick_params(self.kind.server_params))
+                self.url = server['upload_url']
+                self.url_expires = self.clock() + self.url_ttl
+            return self.url
+
+    def invalidate_url(self, url):
+        if self.url == url:
+            self.url = None
+
+    async def upload_file(self, file):
+        for attempt in range(2):
+            url = await self.get_upload_url()
+            try:
+                result = await self.client.upload(url, {self.kind.field: file})
+                if self.is_empty(result):
+                    raise ClientError("Upload server returned no file")
+                return result
+            except ClientError:
+                self.invalidate_url(url)
+                if attempt or not self.rewind(file):
+                    raise
+
+    async def save(self, ready, results):
+        batch = AsyncBatch(self.client, MAX_CALLS)
+        futures = [(i, batch.add(self.kind.save_method,
+                                 self.save_params(result)))
+                   for i, result in ready]
+        await batch.flush()
+        for i, future in futures:
+            try:
+                results[i] = self.to_attachment(await future)
+            except Exception as e:
+                results[i] = e
+
+    async def existing(self, attachments):
+        attachments = sorted(set(attachments))
+        if not attachments or self.kind.check_method is None:
+            return set(attachments)
+        items = []
+        for params in self.check_chunks(attachments):
+            items.extend(await self.client.api_request(
+                self.kind.check_method, params))
+        return self.filter_existing(attachments, items)
+
+    async def upload(self, files, return_exceptions=False):
+        results = [None] * len(files)
+        keys, repeats = {}, {}
+        if self.dedupe is not None:
+            # Хеширование и кеш на диске блокируют, выполняем их в потоке
+            loop = asyncio.get_running_loop()
+            keys, hits, repeats = await loop.run_in_executor(
+                None, self.find_duplicates, files)
+            self.reuse(keys, hits, await self.existing(hits.values()),
+                       results)
+        ready = []
+        semaphore = asyncio.Semaphore(self.parallel)
+        pool = None
+        if self.preprocess is not None:
+            pool = ProcessPoolExecutor(self.processes)
+
+        async def upload_file(i, file):
+            try:
+                if pool is not None:
+                    # Подготовка не занимает слот загрузки
+                    file = await asyncio.get_running_loop().run_in_executor(
+                        pool, self.preprocess, *read_image(file))
+                async with semaphore:
+                    return i, await self.upload_file(file), None
+            except Exception as e:
+                return i, None, e
+        try:
+            for task in asyncio.as_completed([
+                    upload_file(i, file) for i, file in enumerate(files)
+                    if results[i] is None and i not in repeats]):
+                i, result, error = await task
+                if error is None:
+                    ready.append((i, result))
+                else:
+                    results[i] = error
+                if len(ready) == MAX_CALLS:
+                    await self.save(ready, results)
+                    ready = []
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False)
+        if ready:
+            await self.save(ready, results)
+        if self.dedupe is not None:
+            self.remember(keys, repeats, results)
+        if not return_exceptions:
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+        return results
+
+
+class AsyncDownloader(Downloader):
+    """Асинхронный аналог :class:`vkapi.downloads.Downloader`: файлы
+    скачиваются в parallel задачах, запись на диск выполняется в пуле
+    потоков."""
+    async def fetch(self, url, part):
+        loop = asyncio.get_running_loop()
+        headers, offset = self.request_headers(part)
+        response = await self.client.transport.request(
+            'GET', url, headers=self.client.merge_headers(headers),
+            stream=True)
+        try:
+            mode = self.check_response(response, url, part, offset)
+            if mode is None:
+                return
+            with open(part, mode) as fp:
+                async for chunk in response.iter_content(self.chunk_size):
+                    await loop.run_in_executor(None, fp.write, chunk)
+        finally:
+            response.close()
+
+    async def download_file(self, url, path):
+        if os.path.exists(path):
+            return path
+        part = path + '.part'
+        policy = self.client.retry_policy
+        attempt = 0
+        while True:
+            try:
+                await self.fetch(url, part)
+                break
+            except TransportError:
+                if attempt >= policy.retries:
+                    raise
+                await asyncio.sleep(policy.delay(attempt))
+                attempt += 1
+        os.replace(part, path)
+        return path
+
+    async def download(self, items, return_exceptions=False):
+        paths, unique = self.plan(items)
+        os.makedirs(self.directory, exist_ok=True)
+        errors = {}
+        semaphore = asyncio.Semaphore(self.parallel)
+
+        async def download_file(url, path):
+            async with semaphore:
+                try:
+                    await self.download_file(url, path)
+                except Exception as e:
+                    errors[path] = e
+        tasks = [download_file(url, path) for url, path in unique.items()]
+        for done, task in enumerate(asyncio.as_completed(tasks), 1):
+            await task
+            if self.progress is not None:
+                self.progress(done, len(tasks))
+        results = [errors.get(path, path) for path in paths]
+        if errors and not return_exceptions:
+            raise next(r for r in results if isinstance(r, Exception))
+        return results
+
+
+class AsyncApi(Api):
+    async def _typed_call(self, params):
+        return convert(
+            await self._client.api_request(self._method, params),
+            self._record)
+
+    def _typed_items(self, items):
+        if self._record is None:
+            return items
+        return map_items(self._record.from_dict, items)
+
+    def iter(self, *args, page_size=100, prefetch=True, **kwargs):
+        """Возвращает асинхронный генератор элементов списка.
+
+        Usage::
+            >> async for user in vk.api.groups.getMembers.iter(group_id=1):
+            ..     print(user)
+        """
+        return self._typed_items(iter_items(
+            self._client, self._method, self._params(args, kwargs),
+            page_size, prefetch))
+
+    def bulk(self, *args, page_size=1000, pages_per_call=25, **kwargs):
+        """Асинхронный аналог :meth:`vkapi.client.Api.bulk`."""
+        return self._typed_items(iter_bulk(
+            self._client, self._method, self._params(args, kwargs),
+            page_size, pages_per_call))
+
+
+async def map_items(func, items):
+    async for item in items:
+        yield func(item)
+
+
+async def iter_items(client, method, params, page_size=100, prefetch=True):
+    """Асинхронный аналог :func:`vkapi.paging.iter_items`. Следующая
+    страница загружается в отдельной задаче."""
+    pager = Pager(params, page_size)
+    page = await client.api_request(method, pager.next_params())
+    while True:
+        items = pager.items(page)
+        if pager.done:
+            for item in items:
+                yield item
+            return
+        if prefetch:
+            task = asyncio.ensure_future(
+                client.api_request(method, pager.next_params()))
+            try:
+                for item in items:
+                    yield item
+            except BaseException:
+                task.cancel()
+                raise
+            page = await task
+        else:
+            for item in items:
+                yield item
+            page = await client.api_request(method, pager.next_params())
+
+
+async def iter_bulk(client, method, params, page_size=1000, pages_per_call=25):
+    """Асинхронный аналог :func:`vkapi.paging.iter_bulk`."""
+    pager = BulkPager(method, params, page_size, pages_per_call)
+    while not pager.done:
+        try:
+            result = await client.api_request(
+                'execute', {'code': pager.code()})
+        except ApiError as e:
+            if pager.retry(e):
+                continue
+            raise
+        for item in pager.items(result):
+            yield item
+        if pager.failed:
+            page = await client.api_request(method, pager.page_params())
+            for item in pager.page_items(page):
+                yield item
@@ -1,5 +1,5 @@
 from . import defaults
-from .browser import Browser
+from .browser import Browser, get_application
 from .ui_auth import Ui_Auth
 from .utils import parse_hash
 from PyQt5.QtGui import QImage, QPixmap
@@ -17,6 +17,7 @@ class AuthDirect(QDialog):
                  password='',
                  scope='',
                  test_redirect_uri=0):
+        get_application()
         super().__init__()
         self.logger = logging.getLogger('.'.join([
             self.__class__.__module__, self.__class__.__name__]))
@@ -125,7 +126,7 @@ class AuthDirect(QDialog):
         self.ui.captcha_frame.show()
 
     def load_captcha(self):
-        data = self.client.http.get(self.captcha_img).content
+        data = self.client.fetch_captcha_image(self.captcha_img)
         pix = QPixmap.fromImage(QImage.fromData(data))
         self.ui.captcha_image.setPixmap(pix)
         self.ui.captcha_line.clear()
@@ -0,0 +1,190 @@
+"""Объединение вызовов Api в один запрос к методу execute.
+
+Метод execute позволяет выполнить до 25 методов Api за один запрос
+<https://vk.com/dev/execute>. Вызовы компилируются в код на VKScript вида::
+
+    return [API.users.get({"user_ids": 1}), API.groups.getById(...)];
+
+Если какой-то из вызовов завершился ошибкой, то на его месте в ответе будет
+false, а сама ошибка попадет в поле `execute_errors`.
+"""
+from concurrent.futures import Future
+import contextvars
+import json
+import threading
+
+MAX_CALLS = 25
+
+# Текущий батч. Переменная контекста изолирует батчи разных потоков и
+# задач asyncio
+_active_batch = contextvars.ContextVar('vkapi_active_batch', default=None)
+
+
+def active_batch(client):
+    """Возвращает батч, открытый для клиента в текущем контексте."""
+    batch = _active_batch.get()
+    if batch is not None and batch.client is client:
+        return batch
+    return None
+
+
+def compile_code(calls):
+    """Компилирует список вызовов в код на VKScript.
+
+    :param calls: Список пар (метод, параметры)
+    :type calls: list
+    :rtype: str
+    """
+    return "return [{}];".format(",".join(
+        "API.{}({})".format(method, json.dumps(params, ensure_ascii=False))
+        for method, params in calls
+    ))
+
+
+class Batch:
+    """Накапливает вызовы методов Api и отправляет их через execute.
+
+    Обычно создается через :meth:`vkapi.client.Client.batch`.
+    """
+    def __init__(self, client, max_calls=MAX_CALLS):
+        if not 0 < max_calls <= MAX_CALLS:
+            raise ValueError("max_calls must be between 1 and {}".format(
+                MAX_CALLS))
+        self.client = client
+        self.max_calls = max_calls
+        self.calls = []
+        self.token = None
+
+    def __len__(self):
+        return len(self.calls)
+
+    def __enter__(self):
+        self.activate()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.deactivate()
+        if exc_type is None:
+            self.flush()
+        else:
+            self.cancel()
+
+    def activate(self):
+        self.token = _active_batch.set(self)
+
+    def deactivate(self):
+        _active_batch.reset(self.token)
+
+    def create_future(self):
+        return Future()
+
+    def add(self, method, params):
+        """Добавляет вызов в очередь.
+
+        :return: Future, в который будет записан результат вызова
+        """
+        future = self.create_future()
+        self.calls.append((method, params, future))
+        return future
+
+    def pop_chunk(self):
+        chunk = self.calls[:self.max_calls]
+        del self.calls[:self.max_calls]
+        return chunk
+
+    def flush(self):
+        """Отправляет все накопленные вызовы."""
+        while self.calls:
+            self.execute(self.pop_chunk())
+
+    def cancel(self):
+        for method, params, future in self.calls:
+            future.cancel()
+        self.calls = []
+
+    def execute(self, chunk):
+        try:
+            response, params = self.client.send_api_request(
+                'execute', {'code': self.compile(chunk)})
+            if 'error' in response:
+                # Ошибка самого execute (капча, валидация, неверный токен).
+                # Если обработчик повторил запрос, то execute_errors уже не
+                # доступны и для неудачных вызовов вернется false
+                result = self.client.process_api_response(
+                    response, 'execute', params)
+                errors = None
+            else:
+                result = response.response
+                errors = response.get('execute_errors')
+        except Exception as e:
+            for _, _, future in chunk:
+                # Вызывающий мог отменить свой Future, остальные все равно
+                # должны получить результат
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.resolve(chunk, result, errors)
+
+    def compile(self, chunk):
+        return compile_code([(method, params) for method, params, _ in chunk])
+
+    def resolve(self, chunk, result, errors):
+        """Раскладывает результат execute по Future."""
+        from .client import ApiError, ClientError
+        errors = list(errors or [])
+        if not isinstance(result, list) or len(result) != len(chunk):
+            error = ClientError("Unexpected execute response: {!r}".format(
+                result))
+            for _, _, future in chunk:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (method, _, future), value in zip(chunk, result):
+            # Ошибки в execute_errors идут в том же порядке, что и вызовы
+            error = None
+            if value is False and errors and errors[0].get('method') == method:
+                error = ApiError(errors.pop(0))
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(value)
+
+
+class AutoBatcher:
+    """Объединяет вызовы из разных потоков, сделанные в течение `window`
+    секунд, в один execute. Вызывающий поток блокируется до получения
+    результата.
+    """
+    def __init__(self, client, window, max_calls=MAX_CALLS):
+        self.client = client
+        self.window = window
+        self.max_calls = max_calls
+        self.lock = threading.Lock()
+        self.pending = None
+
+    def call(self, method, params):
+        with self.lock:
+            if self.pending is None:
+                self.pending = Batch(self.client, self.max_calls)
+                timer = threading.Timer(
+                    self.window, self.flush, (self.pending,))
+                timer.daemon = True
+                timer.start()
+            batch = self.pending
+            future = batch.add(method, params)
+            full = len(batch) >= self.max_calls
+            if full:
+                self.pending = None
+        if full:
+            batch.flush()
+        return future.result()
+
+    def flush(self, batch):
+        with self.lock:
+            if self.pending is not batch:
+                # Уже отправлен потоком, заполнившим батч
+                return
+            self.pending = None
+        batch.flush()
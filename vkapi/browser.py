@@ -1,11 +1,24 @@
 from PyQt5.QtCore import QUrl, Qt
-from PyQt5.QtWidgets import QDialog, QVBoxLayout
+from PyQt5.QtWidgets import QApplication, QDialog, QVBoxLayout
 from PyQt5.QtWebKitWidgets import QWebView
 import logging
+import sys
+
+_application = None
+
+
+def get_application():
+    """Возвращает QApplication, создавая его при первом вызове. Без него
+    нельзя создать ни одного окна."""
+    global _application
+    if _application is None:
+        _application = QApplication.instance() or QApplication(sys.argv)
+    return _application
 
 
 class Browser(QDialog):
     def __init__(self, url):
+        get_application()
         super().__init__(None, Qt.Window)
         self.logger = logging.getLogger('.'.join([
             self.__class__.__module__, self.__class__.__name__]))
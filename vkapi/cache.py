@@ -0,0 +1,258 @@
+"""Кеширование ответов Api.
+
+Кешируются только методы из белого списка, изменяющие методы вроде wall.post
+в кеш никогда не попадут. Если результат вызова зависит от владельца токена
+(см. :func:`vkapi.methods.is_public`), то в ключ входит хеш токена. Поэтому
+один кеш можно использовать с разными токенами.
+
+Usage::
+    >> vk = Client(cache=MemoryCache(maxsize=10000))
+    >> vk.api.users.get(user_ids=1)  # запрос к Api
+    >> vk.api.users.get(user_ids=1)  # из кеша
+    >> vk.cache.hits, vk.cache.misses
+    (1, 1)
+
+Возвращаемые из кеша объекты не копируются, их не следует изменять.
+
+:class:`SqliteCache` хранит ответы на диске и переживает перезапуск
+процесса, один файл могут использовать несколько процессов одновременно.
+"""
+from .methods import PUBLIC_METHODS, is_public, is_read_only
+from .ratelimit import hash_key
+from collections import OrderedDict
+import json
+import pickle
+import sqlite3
+import threading
+import time
+
+# Время жизни записей в секундах для отдельных методов
+DEFAULT_TTLS = {
+    'database.getCountries': 24 * 3600,
+    'groups.getById': 3600,
+    'users.get': 600,
+    'utils.resolveScreenName': 3600,
+}
+DEFAULT_TTL = 300
+# Методы, кешируемые по умолчанию
+DEFAULT_METHODS = frozenset(PUBLIC_METHODS) | {'groups.getById'}
+# Параметры, которые не влияют на результат
+IGNORED_PARAMS = frozenset([
+    'access_token', 'sig', 'captcha_sid', 'captcha_key'])
+# Возвращается при отсутствии ключа в кеше
+MISSING = object()
+
+
+class BaseCache:
+    """Общая часть всех кешей: выбор кешируемых вызовов, ключи и счетчики.
+
+    :param ttl: Время жизни записи по умолчанию
+    :param ttls: Время жизни для отдельных методов
+    :param methods: Белый список кешируемых методов, по умолчанию -
+        :data:`DEFAULT_METHODS`
+    """
+    def __init__(self, ttl=DEFAULT_TTL, ttls=None, methods=None):
+        self.ttl = ttl
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.methods = frozenset(methods or DEFAULT_METHODS)
+        self.hits = 0
+        self.misses = 0
+
+    def cacheable(self, method, params):
+        return method in self.methods and is_read_only(method)
+
+    def make_key(self, method, params):
+        """Ключ из имени метода и параметров, отсортированных по имени. Для
+        вызовов, результат которых зависит от владельца токена, в ключ
+        добавляется хеш токена."""
+        items = sorted((k, str(v)) for k, v in params.items()
+                       if k not in IGNORED_PARAMS)
+        token = params.get('access_token')
+        if token and not is_public(method, params):
+            items.append(('access_token', hash_key(token).hex()))
+        return json.dumps([method, items], ensure_ascii=False)
+
+    def method_ttl(self, method):
+        return self.ttls.get(method, self.ttl)
+
+    def lookup(self, method, params):
+        """Возвращает закешированный результат вызова или MISSING."""
+        value = self.get(self.make_key(method, params))
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def store(self, method, params, value):
+        self.set(self.make_key(method, params), value,
+                 self.method_ttl(method))
+
+    @property
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self)}
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class MemoryCache(BaseCache):
+    """Кеш в памяти процесса с вытеснением давно не использовавшихся
+    записей (LRU).
+
+    :param maxsize: Максимальное количество записей
+    """
+    def __init__(self, maxsize=1024, ttl=DEFAULT_TTL, ttls=None, methods=None,
+                 clock=time.monotonic):
+        super().__init__(ttl, ttls, methods)
+        self.maxsize = maxsize
+        self.clock = clock
+        self.lock = threading.Lock()
+        # key -> (время истечения, значение)
+        self.data = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return MISSING
+            expires, value = item
+            if expires < self.clock():
+                del self.data[key]
+                return MISSING
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.data[key] = (self.clock() + ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
+
+
+class SqliteCache(BaseCache):
+    """Кеш в базе SQLite.
+
+    Значения сериализуются через pickle. База работает в режиме WAL, поэтому
+    читатели из других процессов не блокируются записью. Каждый поток
+    использует свое соединение.
+
+    При превышении maxsize удаляются просроченные записи, а затем записи,
+    срок жизни которых истекает раньше других. Проверка выполняется раз в
+    prune_interval операций записи.
+
+    :param filename: Путь к файлу базы
+    :param maxsize: Максимальное количество записей
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cache (
+            key TEXT PRIMARY KEY,
+            expires REAL NOT NULL,
+            value BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+    """
+
+    def __init__(self, filename, maxsize=100000, ttl=DEFAULT_TTL, ttls=None,
+                 methods=None, prune_interval=1000, timeout=30,
+                 clock=time.time):
+        super().__init__(ttl, ttls, methods)
+        self.filename = filename
+        self.maxsize = maxsize
+        self.prune_interval = prune_interval
+        self.timeout = timeout
+        # Время должно совпадать между запусками, поэтому не monotonic
+        self.clock = clock
+        self.local = threading.local()
+        self.writes = 0
+        self.connection.executescript(self.SCHEMA)
+
+    @property
+    def connection(self):
+        conn = getattr(self.local, 'connection', None)
+        if conn is None:
+            # isolation_level=None - каждая команда в своей транзакции
+            conn = sqlite3.connect(
+                self.filename, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = conn
+        return conn
+
+    def get(self, key):
+        row = self.connection.execute(
+            "SELECT expires, value FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return MISSING
+        expires, value = row
+        if expires < self.clock():
+            self.connection.execute(
+                "DELETE FROM cache WHERE key = ? AND expires = ?",
+                (key, expires))
+            return MISSING
+        return pickle.loads(value)
+
+    def set(self, key, value, ttl):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO cache (key, expires, value) "
+            "VALUES (?, ?, ?)",
+            (key, self.clock() + ttl,
+             pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+        self.writes += 1
+        if self.writes % self.prune_interval == 0:
+            self.prune()
+
+    def delete(self, key):
+        self.connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def prune(self):
+        """Удаляет просроченные записи и ограничивает размер кеша."""
+        conn = self.connection
+        conn.execute("DELETE FROM cache WHERE expires < ?", (self.clock(),))
+        conn.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+            "ORDER BY expires DESC LIMIT -1 OFFSET ?)", (self.maxsize,))
+
+    def vacuum(self):
+        """Удаляет лишние записи и возвращает освободившееся место."""
+        self.prune()
+        self.connection.execute("VACUUM")
+
+    def clear(self):
+        self.connection.execute("DELETE FROM cache")
+
+    def close(self):
+        conn = getattr(self.local, 'connection', None)
+        if conn is not None:
+            conn.close()
+            self.local.connection = None
+
+    def __len__(self):
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM cache").fetchone()[0]
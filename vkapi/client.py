@@ -1,16 +1,21 @@
 from . import defaults
-from .browser import Browser
-from .datatypes import AttrDict
-from .ui_captcha import Ui_Captcha
-from .utils import parse_hash
-from PyQt5.QtGui import QImage, QPixmap
-from PyQt5.QtWidgets import QApplication, QDialog
+from .batch import AutoBatcher, Batch, MAX_CALLS, active_batch
+from .cache import MISSING
+from .datatypes import wrap
+from .decoders import LazyDecoder
+from .multipart import MultipartEncoder
+from .paging import iter_bulk, iter_items
+from .ratelimit import RATE_LIMIT_CODES, RateLimiter
+from .records import convert
+from .retry import RetryPolicy
+from .streaming import StreamParser
+from .transports import KeepAlive, RequestsTransport, TransportError
+import functools
 import hashlib
 import json
 import logging
 import os
 import re
-import requests
 import sys
 import time
 import urllib.parse
@@ -23,6 +28,25 @@ __url__ = "github.com/s3rgeym/vkapi/"
 
 
 API_METHOD_REGEXP = re.compile("[a-z]+([A-Z][a-z]+)*$")
+# Mozilla/5.0 (compatible; vkapi.client/3.0; Python/3.4.3;
+# +github.com/s3rgeym/vkapi/)
+USER_AGENT = defaults.USER_AGENT_FORMAT.format(
+    __name__, __version__, sys.version.split(' ')[0], __url__)
+
+
+@functools.lru_cache(maxsize=1024)
+def get_endpoint(scheme, host, api_path, method):
+    """Возвращает адрес метода и путь к нему. Результат кешируется, так как
+    вычисляется при каждом вызове с одними и теми же аргументами.
+
+    :return: Кортеж из адреса и пути
+    :rtype: tuple
+    """
+    # >>> re.sub('^(/|)|(/|)$', '/', 'foo')
+    # /foo/
+    path = re.sub('^(/|)|(/|)$', '/', api_path)
+    path = urllib.parse.urljoin(path, method)
+    return "{}://{}{}".format(scheme, host, path), path
 
 
 class Client:
@@ -43,6 +67,8 @@ class Client:
     к нему подчеркивание (global_, from_).
     """
     SAVED_ATTRS = ['access_token', 'user_id', 'secret_token', 'token_expiry']
+    # Ошибки соединения, после которых запрос можно повторить
+    TRANSPORT_ERRORS = (TransportError,)
 
     def __init__(self,
                  session_filename=None,
@@ -53,7 +79,14 @@ class Client:
                  api_params=None,
                  api_delay=None,
                  api_version=None,
-                 http=None):
+                 http=None,
+                 batch_window=None,
+                 rate_limiter=None,
+                 cache=None,
+                 decoder=None,
+                 retry_policy=None,
+                 transport=None,
+                 headers=None):
         """Конструктор.
 
         :param session_filename: Имя файла куда будут сохранены данные от
@@ -76,8 +109,31 @@ class Client:
             передаваться при каждом запросе (помимо токена и версии Api).
             Например: {'https': 1, 'lang': 'en'}
         :type api_params: dict
-        :param http: Сессия requests
+        :param http: Сессия requests для транспорта по умолчанию
         :type http: requests.Session instance
+        :param batch_window: Если задано, то вызовы через Client.api,
+            сделанные из разных потоков в течение этого времени (в секундах),
+            объединяются в один вызов execute
+        :type batch_window: float
+        :param rate_limiter: Ограничитель частоты запросов. По умолчанию
+            запросы отправляются не чаще одного раза в api_delay секунд.
+            Один ограничитель можно передать нескольким клиентам с общим
+            токеном
+        :type rate_limiter: :class:`vkapi.ratelimit.RateLimiter`
+        :param cache: Кеш ответов для неизменяющих методов
+        :type cache: :class:`vkapi.cache.MemoryCache` или
+            :class:`vkapi.cache.SqliteCache`
+        :param decoder: Декодер ответов сервера, по умолчанию
+            :class:`vkapi.decoders.LazyDecoder`
+        :param retry_policy: Правила повтора запросов при временных
+            ошибках, по умолчанию до 5 повторов методов чтения
+        :type retry_policy: :class:`vkapi.retry.RetryPolicy`
+        :param transport: HTTP-транспорт, по умолчанию
+            :class:`vkapi.transports.RequestsTransport`
+        :type transport: :class:`vkapi.transports.Transport`
+        :param headers: Заголовки, которые этот клиент добавляет к своим
+            запросам. Нужны, когда транспорт общий для нескольких клиентов
+        :type headers: dict
         """
         self.logger = logging.getLogger('.'.join([
             self.__class__.__module__, self.__class__.__name__]))
@@ -88,30 +144,57 @@ class Client:
         self.secret_token = secret_token
         self.api_params = api_params or {}
         self.api_delay = api_delay or defaults.API_DELAY
+        self.batch_window = batch_window
         self.api_version = api_version or defaults.API_VERSION
-        if not http:
-            http = requests.session()
-            # Mozilla/5.0 (compatible; vkapi.client/3.0; Python/3.4.3;
-            # +github.com/s3rgeym/vkapi/)
-            http.headers['User-Agent'] = defaults.USER_AGENT_FORMAT.format(
-                __name__, __version__, sys.version.split(' ')[0], __url__)
-        self.http = http
-        self.last_api_request = 0
+        # Переданный транспорт может быть общим для многих клиентов,
+        # закрывается только созданный самим клиентом
+        self.owns_transport = transport is None
+        self.transport = transport or self.create_transport(http)
+        self.transport.headers.setdefault('User-Agent', USER_AGENT)
+        self.headers = headers or {}
+        self.pinger = None
+        self.rate_limiter = rate_limiter or RateLimiter(1 / self.api_delay)
+        self.cache = cache
+        self.decoder = decoder or LazyDecoder()
+        self.retry_policy = retry_policy or RetryPolicy()
         # Сахар над вызовом api_request
-        self.api = Api(self)
+        self.api = self.create_api()
+        self.batcher = self.create_batcher() if batch_window else None
         self.load_session()
-        self.qapp = QApplication.instance() or QApplication(sys.argv)
 
-    def request(self, method, url, **kwargs):
+    def create_api(self):
+        return Api(self)
+
+    def create_transport(self, http=None):
+        return RequestsTransport(session=http)
+
+    @property
+    def http(self):
+        """Сессия HTTP-библиотеки, которую использует транспорт."""
+        return self.transport.session
+
+    def request(self, method, url, headers=None, **kwargs):
         start_time = time.time()
-        response = self.http.request(method, url, **kwargs)
+        response = self.transport.request(
+            method, url, headers=self.merge_headers(headers), **kwargs)
         request_time = (time.time() - start_time) * 1000
         self.logger.debug("Total Request Time: %dms", request_time)
-        return response.json(object_hook=AttrDict)
-        # try:
-        #     return response.json(object_hook=AttrDict)
-        # else:
-        #     return response.text
+        self.check_status(response, url)
+        return self.decoder.decode(response.content)
+
+    def check_status(self, response, url):
+        """При перегрузке сервер отвечает HTML-страницей 502/503. Это такая
+        же временная ошибка, как обрыв соединения, поэтому выбрасывается
+        TransportError, и запрос повторяется по :attr:`retry_policy`."""
+        if response.status >= 500:
+            response.close()
+            raise TransportError("Server error {} for {}".format(
+                response.status, url))
+
+    def merge_headers(self, headers):
+        if not headers:
+            return self.headers
+        return {**self.headers, **headers}
 
     def get(self, url, params=None, **kwargs):
         return self.request('GET', url, params=params, **kwargs)
@@ -132,47 +215,163 @@ class Client:
         :return: Возвращает содержимое поля `response`. Заметьте, что к
             элементам словаря можно обращаться как к аттрибутам через точечную
             нотацию. Вместо обычного словаря используется
-            :class:``vkapi.structures.AttrDict``.
+            :class:``vkapi.datatypes.AttrDict``.
+        """
+        if self.cache is not None and self.cache.cacheable(method, params):
+            return self.cached_api_request(method, params)
+        return self.perform_api_request(method, params)
+
+    def cached_api_request(self, method, params):
+        # Результат зависит от версии Api и общих параметров вроде lang
+        key_params = dict(self.api_params, v=self.api_version,
+                          access_token=self.access_token)
+        key_params.update(params)
+        result = self.cache.lookup(method, key_params)
+        if result is MISSING:
+            result = self.perform_api_request(method, params)
+            self.cache.store(method, key_params, result)
+        return result
+
+    def perform_api_request(self, method, params):
+        """Отправляет запрос и обрабатывает ответ, повторяя запрос при
+        временных ошибках согласно :attr:`retry_policy`."""
+        attempt = 0
+        waited = 0
+        while True:
+            try:
+                response, sent_params = self.send_api_request(method, params)
+                result = self.process_api_response(
+                    response, method, sent_params)
+            except (ApiError,) + self.TRANSPORT_ERRORS as e:
+                delay = self.retry_policy.next_delay(
+                    method, e, attempt, waited)
+                if delay is None:
+                    raise
+                self.logger.warning(
+                    "Retrying %r in %.2fs after error: %s", method, delay, e)
+            else:
+                return result
+            time.sleep(delay)
+            attempt += 1
+            waited += delay
+
+    def send_api_request(self, method, params):
+        """Отправляет запрос к Api без обработки ошибок.
+
+        :return: Кортеж из ответа сервера целиком и отправленных параметров
+        :rtype: tuple
+        """
+        api_endpoint, params = self.prepare_api_request(method, params)
+        self.logger.debug(
+            "Calling Api method %r with parameters: %s", method, params)
+        with self.rate_limiter.slot(self.access_token):
+            response = self.post(api_endpoint, params)
+        self.rate_feedback(response)
+        return response, params
+
+    def rate_feedback(self, response):
+        """Сообщает ограничителю частоты результат запроса. Здесь, а не при
+        обработке ответа, чтобы учитывались и execute из :class:`Batch`,
+        и потоковые запросы. Ошибки частоты во вложенных вызовах execute
+        (execute_errors) тоже учитываются."""
+        error = response.get('error')
+        if not error:
+            error = next((e for e in response.get('execute_errors') or ()
+                          if e.get('error_code') in RATE_LIMIT_CODES), None)
+        self.rate_limiter.feedback(
+            self.access_token, ApiError(error) if error else None)
+
+    def api_stream(self, method, params={}, chunk_size=64 * 1024):
+        """Делает запрос к Api и возвращает генератор элементов массива
+        response.items (или response, если это массив), которые разбираются
+        по мере загрузки ответа, см. :class:`vkapi.streaming.StreamParser`.
+
+        Ошибки обрабатываются так же, как в :meth:`api_request`, но запрос
+        повторяется, только пока не получено ни одного элемента.
+        """
+        attempt = 0
+        waited = 0
+        while True:
+            started = False
+            try:
+                for item in self.send_api_stream(method, params, chunk_size):
+                    started = True
+                    yield item
+                return
+            except (ApiError,) + self.TRANSPORT_ERRORS as e:
+                if started:
+                    raise
+                delay = self.retry_policy.next_delay(
+                    method, e, attempt, waited)
+                if delay is None:
+                    raise
+                self.logger.warning(
+                    "Retrying %r in %.2fs after error: %s", method, delay, e)
+            time.sleep(delay)
+            attempt += 1
+            waited += delay
+
+    def send_api_stream(self, method, params, chunk_size):
+        """Один потоковый запрос к Api без повторов."""
+        api_endpoint, params = self.prepare_api_request(method, params)
+        self.logger.debug(
+            "Streaming Api method %r with parameters: %s", method, params)
+        with self.rate_limiter.slot(self.access_token):
+            response = self.transport.request(
+                'POST', api_endpoint, data=params, headers=self.headers,
+                stream=True)
+        self.check_status(response, api_endpoint)
+        parser = StreamParser()
+        try:
+            for chunk in response.iter_content(chunk_size):
+                yield from parser.feed(chunk)
+                if parser.done:
+                    break
+            else:
+                yield from parser.close()
+        finally:
+            response.close()
+        self.rate_feedback(wrap({'error': parser.error}))
+        if parser.error:
+            result = self.process_api_response(
+                wrap({'error': parser.error}), method, params)
+            if isinstance(result, dict):
+                result = result.get('items', [])
+            yield from result
+
+    def prepare_api_request(self, method, params):
+        """Добавляет к параметрам токен, версию Api и подпись.
+
+        :return: Кортеж из адреса метода и параметров запроса
+        :rtype: tuple
         """
-        q = dict(self.api_params)
-        q.update(params)
-        params = q
+        params = {**self.api_params, **params}
+        # При повторе запроса (например, после капчи) передаются уже
+        # подписанные параметры
+        params.pop('sig', None)
         params['v'] = self.api_version
         if self.access_token:
             params['access_token'] = self.access_token
-        # >>> re.sub('^(/|)|(/|)$', '/', 'foo')
-        # /foo/
-        path = re.sub('^(/|)|(/|)$', '/', defaults.API_PATH)
-        path = urllib.parse.urljoin(path, method)
-        # <https://vk.com/dev/api_nohttps>
+        api_endpoint, path = get_endpoint(
+            self.api_scheme, defaults.API_HOST, defaults.API_PATH, method)
         if self.secret_token:
-            # Исправлен баг с неверной подписью. Дело в том, что словари в
-            # python неупорядоченные. Новый элемент может быть добавлен как в
-            # конец так и любое другое место, да и еще элементы могут
-            # поменяться местами. И в итоге имеем, что:
-            # md5('foo=bar&baz=qux') != md5('baz=qux&foo=bar')
-            # Чтобы закрепить порядок элементов, добавим sig
-            params['sig'] = ''
-            # Сформировали Query String из словаря
+            # Словари упорядочены, а sig добавляется последним, поэтому
+            # параметры будут отправлены в том же порядке, в котором
+            # подписаны
             query = urllib.parse.urlencode(params)
-            # А теперь вырежем параметр sig
-            query = re.sub('^sig=&|&sig=', '', query)
             uri = '{}?{}{}'.format(path, query, self.secret_token)
-            sig = hashlib.md5(uri.encode('ascii')).hexdigest()
-            params["sig"] = sig
-            scheme = 'http'
-        else:
-            scheme = 'https'
+            params['sig'] = hashlib.md5(uri.encode('ascii')).hexdigest()
         # !!! params не должен изменяться после добавления sig
-        api_endpoint = "{}://{}{}".format(scheme, defaults.API_HOST, path)
-        delay = self.api_delay + self.last_api_request - time.time()
-        if delay > 0:
-            self.logger.debug("Wait %dms", delay * 1000)
-            time.sleep(delay)
-        self.logger.debug(
-            "Calling Api method %r with parameters: %s", method, params)
-        response = self.post(api_endpoint, params)
-        self.last_api_request = time.time()
+        return api_endpoint, params
+
+    @property
+    def api_scheme(self):
+        # <https://vk.com/dev/api_nohttps>
+        return 'http' if self.secret_token else 'https'
+
+    def process_api_response(self, response, method, params):
+        """Возвращает содержимое поля `response` либо передает ошибку
+        соответствующему обработчику."""
         error = response.get('error')
         if error:
             if 'captcha_img' in error:
@@ -193,38 +392,130 @@ class Client:
             return self.handle_error(error, method, params)
         return response.response
 
+    # Объединение запросов в execute
+
+    def batch(self, max_calls=None):
+        """Возвращает контекстный менеджер, внутри которого вызовы через
+        Client.api не выполняются сразу, а возвращают
+        :class:`concurrent.futures.Future`. При выходе из блока вызовы
+        отправляются пачками по 25 штук через метод execute.
+
+        Usage::
+            >> with vk.batch():
+            ..     a = vk.api.users.get(user_ids=1)
+            ..     b = vk.api.groups.getById(group_id=1)
+            >> print(a.result()[0].first_name, b.result()[0].name)
+        """
+        return Batch(self, max_calls or MAX_CALLS)
+
+    def create_batcher(self):
+        return AutoBatcher(self, self.batch_window)
+
     # Обработчики ошибок
 
     def handle_captcha(self, captcha_img, captcha_sid, method, params):
-        c = Captcha(self, captcha_img)
-        if c.exec_():
-            params['captcha_sid'] = captcha_sid
-            params['captcha_key'] = c.ui.captcha_line.text()
-            return self.api_request(method, params)
-        raise ClientError("Action canceled by user")
+        params['captcha_sid'] = captcha_sid
+        params['captcha_key'] = self.ask_captcha(captcha_img)
+        return self.api_request(method, params)
 
     def handle_validation(self, redirect_uri, method, params):
-        if not Validation(self, redirect_uri).exec_():  # raises ClientError
-            raise ClientError("Action canceled by user")
-        self.save_session()
+        self.validate(redirect_uri)
         return self.api_request(method, params)
 
     def handle_error(self, error, method, params):
         """Обработчик всех ошибок кроме капчи и валидации"""
-        # Для переопределения в классах потомках.
-        # if error.code == vkapi.errors.TOO_MANY_REQUESTS_PER_SECOND:
-        #     time.sleep(5)
-        #     return self.api_request(method, params)
+        # Для переопределения в классах потомках. Временные ошибки
+        # повторяются в perform_api_request, см. vkapi.retry
         raise error
 
+    # Диалоги
+
+    # PyQt5 загружается только при первом показе диалога, поэтому для
+    # работы с Api не нужны ни Qt, ни дисплей
+
+    @property
+    def qapp(self):
+        from .browser import get_application
+        return get_application()
+
+    def ask_captcha(self, captcha_img):
+        """Показывает диалог ввода капчи и возвращает введенный текст."""
+        from .dialogs import Captcha
+        c = Captcha(self, captcha_img)
+        if not c.exec_():
+            raise ClientError("Action canceled by user")
+        return c.ui.captcha_line.text()
+
+    def validate(self, redirect_uri):
+        """Открывает страницу валидации и сохраняет полученный токен."""
+        from .dialogs import Validation
+        if not Validation(self, redirect_uri).exec_():  # raises ClientError
+            raise ClientError("Action canceled by user")
+        if self.session_filename:
+            self.save_session()
+
+    def fetch_captcha_image(self, captcha_img):
+        return self.transport.request(
+            'GET', captcha_img, headers=self.headers).content
+
     # Загрузка файлов
 
-    def upload(self, upload_url, files):
-        response = self.post(upload_url, files=files)
+    def upload(self, upload_url, files, progress=None):
+        """Загружает файлы на сервер загрузки. Тело запроса кодируется
+        потоково, поэтому файлы не читаются в память целиком.
+
+        Usage::
+            >> server = vk.api.video.save(name='Video')
+            >> vk.upload(server.upload_url, {'video_file': 'video.mp4'},
+            ..           progress=lambda sent, total: print(sent, total))
+
+        :param files: Словарь: имя поля - путь к файлу, файловый объект,
+            bytes, mmap или кортеж (имя файла, файл[, тип содержимого]),
+            см. :class:`vkapi.multipart.MultipartEncoder`
+        :param progress: Функция progress(sent, total), которая вызывается
+            по мере отправки
+        """
+        with MultipartEncoder(files, callback=progress) as encoder:
+            response = self.post(upload_url, data=encoder, headers={
+                'Content-Type': encoder.content_type,
+                'Content-Length': str(len(encoder)),
+            })
         if 'error' in response:
             raise ClientError(response.error)
         return response
 
+    # Соединения
+
+    def warmup(self, n_connections=1, keep_alive_interval=None):
+        """Заранее открывает соединения с сервером Api, чтобы первые вызовы
+        после запуска не тратили время на DNS, TCP и TLS.
+
+        Usage::
+            >> vk = Client(access_token=token)
+            >> vk.warmup(4, keep_alive_interval=30)
+
+        :param n_connections: Количество соединений, не больше размера пула
+            транспорта
+        :param keep_alive_interval: Если задано, то каждые
+            keep_alive_interval секунд фоновый поток отправляет HEAD-запросы
+            по открытым соединениям, чтобы сервер не закрыл их из-за
+            бездействия, и открывает заново закрытые
+        :return: Количество открытых соединений
+        """
+        url = '{}://{}/'.format(self.api_scheme, defaults.API_HOST)
+        opened = self.transport.warmup(url, n_connections)
+        if keep_alive_interval:
+            self.stop_keep_alive()
+            self.pinger = KeepAlive(
+                self.transport, url, n_connections, keep_alive_interval)
+            self.pinger.start()
+        return opened
+
+    def stop_keep_alive(self):
+        if self.pinger is not None:
+            self.pinger.stop()
+            self.pinger = None
+
     # Работа с токеном
 
     @property
@@ -288,54 +579,35 @@ class Client:
         self.secret_token = data.get('secret')
 
 
-class Captcha(QDialog):
-    def __init__(self, client, captcha_img):
-        self.client = client
-        self.captcha_img = captcha_img
-        super().__init__()
-        self.ui = Ui_Captcha()
-        self.ui.setupUi(self)
-        self.ui.refresh_captcha_button.clicked.connect(self.load_captcha)
-
-    def load_captcha(self):
-        data = self.client.http.get(self.captcha_img).content
-        pix = QPixmap.fromImage(QImage.fromData(data))
-        self.ui.captcha_image.setPixmap(pix)
-        self.ui.captcha_line.clear()
-        self.ui.captcha_line.setFocus()
-
-
-class Validation(Browser):
-    def __init__(self, client, url):
-        self.client = client
-        super().__init__(url)
-
-    def on_url_changed(self, url):
-        self.logger.debug("URL changed: %s", str(url))
-        if not url.hasFragment():
-            return
-        result = parse_hash(url.fragment())
-        if 'error' in result:
-            self.reject()
-            raise ClientError(result['error_description'])
-        self.client.from_dict(result)
-        self.accept()
-        self.logger.info('Validation successful')
-
-
 class Api:
-    def __init__(self, client, method=None):
+    def __init__(self, client, method=None, record=None):
         self._client = client
         self._method = method
+        self._record = record
 
     def __getattr__(self, name):
+        # Вызывается только при первом обращении к атрибуту: созданный
+        # объект сохраняется в экземпляре, и vk.api.users.get в цикле
+        # больше не создает новых объектов
         if API_METHOD_REGEXP.match(name):
             method = name if not self._method \
                              else '.'.join([self._method, name])
-            return Api(self._client, method)
+            api = self.__class__(self._client, method)
+            setattr(self, name, api)
+            return api
         raise AttributeError(name)
 
-    def __call__(self, *args, **kwargs):
+    def typed(self, record):
+        """Возвращает метод, результаты которого превращаются в записи
+        указанного типа, см. :mod:`vkapi.records`. Такие вызовы не
+        объединяются в execute.
+
+        Usage::
+            >> users = vk.api.users.get.typed(User)(user_ids='1,2')
+        """
+        return self.__class__(self._client, self._method, record)
+
+    def _params(self, args, kwargs):
         # Если имя именованного параметра совпадает с ключевым словом, то
         # добавляем подчеркивание (from_, global_)
         params = {k[:-1] if len(k) > 1 and k.endswith('_')
@@ -346,8 +618,65 @@ class Api:
             # Если переданы именованные параметры, то обновляем словарь
             d.update(params)
             params = d
+        return params
+
+    def __call__(self, *args, **kwargs):
+        params = self._params(args, kwargs)
+        if self._record is not None:
+            return self._typed_call(params)
+        # execute не объединяется с другими вызовами
+        if self._method != 'execute':
+            active = active_batch(self._client)
+            if active is not None:
+                return active.add(self._method, params)
+            if self._client.batcher is not None:
+                return self._client.batcher.call(self._method, params)
         return self._client.api_request(self._method, params)
 
+    def stream(self, *args, **kwargs):
+        """Возвращает генератор элементов списка, которые разбираются по
+        мере загрузки ответа, см. :meth:`Client.api_stream`.
+
+        Usage::
+            >> for post in vk.api.wall.get.stream(owner_id=1, count=100):
+            ..     print(post.text)
+        """
+        return self._typed_items(self._client.api_stream(
+            self._method, self._params(args, kwargs)))
+
+    def _typed_call(self, params):
+        return convert(
+            self._client.api_request(self._method, params), self._record)
+
+    def _typed_items(self, items):
+        if self._record is None:
+            return items
+        return map(self._record.from_dict, items)
+
+    def iter(self, *args, page_size=100, prefetch=True, **kwargs):
+        """Возвращает генератор элементов списка, см.
+        :func:`vkapi.paging.iter_items`.
+
+        Usage::
+            >> for user in vk.api.groups.getMembers.iter(group_id=1):
+            ..     print(user)
+        """
+        return self._typed_items(iter_items(
+            self._client, self._method, self._params(args, kwargs),
+            page_size, prefetch))
+
+    def bulk(self, *args, page_size=1000, pages_per_call=25, **kwargs):
+        """Возвращает генератор элементов списка, загружаемого через
+        execute, см. :func:`vkapi.paging.iter_bulk`.
+
+        Usage::
+            >> for user_id in vk.api.groups.getMembers.bulk(group_id=1):
+            ..     print(user_id)
+        """
+        return self._typed_items(iter_bulk(
+            self._client, self._method, self._params(args, kwargs),
+            page_size, pages_per_call))
+
 
 class ClientError(Exception):
     pass
@@ -16,3 +16,81 @@ class AttrDict(dict):
             del self[attr]
         except KeyError:
             raise AttributeError(attr)
+
+
+def wrap(value):
+    """Оборачивает словари и списки, чтобы к элементам можно было обращаться
+    через точку. Вложенные объекты оборачиваются только при обращении к ним.
+    """
+    t = type(value)
+    if t is dict:
+        return LazyAttrDict(value)
+    if t is list:
+        return LazyAttrList(value)
+    return value
+
+
+class LazyAttrDict(AttrDict):
+    """AttrDict, вложенные словари и списки которого остаются обычными до
+    первого обращения к ним. Обернутое значение сохраняется на место
+    исходного."""
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        t = type(value)
+        if t is dict or t is list:
+            value = wrap(value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def values(self):
+        return [self[k] for k in self]
+
+    def items(self):
+        return [(k, self[k]) for k in self]
+
+    def pop(self, key, *default):
+        return wrap(dict.pop(self, key, *default))
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        dict.__setitem__(self, key, default)
+        return self[key]
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        return key, wrap(value)
+
+
+class LazyAttrList(list):
+    """Список, элементы которого оборачиваются при обращении к ним."""
+    def __getitem__(self, index):
+        value = list.__getitem__(self, index)
+        if isinstance(index, slice):
+            return LazyAttrList(value)
+        t = type(value)
+        if t is dict or t is list:
+            value = wrap(value)
+            list.__setitem__(self, index, value)
+        return value
+
+    def __iter__(self):
+        for i, value in enumerate(list.__iter__(self)):
+            t = type(value)
+            if t is dict or t is list:
+                value = wrap(value)
+                list.__setitem__(self, i, value)
+            yield value
+
+    def __reversed__(self):
+        for i in range(len(self) - 1, -1, -1):
+            yield self[i]
+
+    def pop(self, index=-1):
+        return wrap(list.pop(self, index))
@@ -0,0 +1,52 @@
+"""Декодирование ответов сервера.
+
+По умолчанию ответ разбирается самым быстрым из установленных модулей
+(orjson, ujson или стандартный json) в обычные словари и списки, а доступ к
+элементам через точку добавляется только на тех уровнях, к которым
+обращается вызывающий код (см. :class:`vkapi.datatypes.LazyAttrDict`).
+
+Usage::
+    >> vk = Client(decoder=AttrDictDecoder())  # как в прежних версиях
+"""
+from .datatypes import AttrDict, wrap
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def get_loads():
+    """Возвращает самую быструю доступную функцию разбора JSON."""
+    if orjson is not None:
+        return orjson.loads
+    if ujson is not None:
+        return ujson.loads
+    return json.loads
+
+
+class AttrDictDecoder:
+    """Превращает каждый объект в :class:`vkapi.datatypes.AttrDict` сразу
+    при разборе. Медленнее, так как для каждого объекта вызывается
+    object_hook."""
+    def decode(self, data):
+        return json.loads(data, object_hook=AttrDict)
+
+
+class LazyDecoder:
+    """Разбирает JSON без object_hook и оборачивает только верхний уровень.
+
+    :param loads: Функция разбора JSON, по умолчанию - самая быстрая из
+        доступных
+    """
+    def __init__(self, loads=None):
+        self.loads = loads or get_loads()
+
+    def decode(self, data):
+        return wrap(self.loads(data))
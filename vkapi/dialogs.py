@@ -0,0 +1,42 @@
+from .browser import Browser, get_application
+from .client import ClientError
+from .ui_captcha import Ui_Captcha
+from .utils import parse_hash
+from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtWidgets import QDialog
+
+
+class Captcha(QDialog):
+    def __init__(self, client, captcha_img):
+        self.client = client
+        self.captcha_img = captcha_img
+        get_application()
+        super().__init__()
+        self.ui = Ui_Captcha()
+        self.ui.setupUi(self)
+        self.ui.refresh_captcha_button.clicked.connect(self.load_captcha)
+
+    def load_captcha(self):
+        data = self.client.fetch_captcha_image(self.captcha_img)
+        pix = QPixmap.fromImage(QImage.fromData(data))
+        self.ui.captcha_image.setPixmap(pix)
+        self.ui.captcha_line.clear()
+        self.ui.captcha_line.setFocus()
+
+
+class Validation(Browser):
+    def __init__(self, client, url):
+        self.client = client
+        super().__init__(url)
+
+    def on_url_changed(self, url):
+        self.logger.debug("URL changed: %s", str(url))
+        if not url.hasFragment():
+            return
+        result = parse_hash(url.fragment())
+        if 'error' in result:
+            self.reject()
+            raise ClientError(result['error_description'])
+        self.client.from_dict(result)
+        self.accept()
+        self.logger.info('Validation successful')
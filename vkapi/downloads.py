@@ -0,0 +1,253 @@
+"""Скачивание фотографий и документов.
+
+:class:`Downloader` принимает объекты из ответов API (фотографии,
+документы, вложения) или адреса и сохраняет файлы в каталог:
+
+    * у фотографии выбирается самый большой размер из sizes или из полей
+      photo_75 ... photo_2560 (или самый большой, не превышающий max_size);
+    * файлы пишутся на диск частями, не загружаясь в память целиком;
+    * одновременно скачивается не больше parallel файлов через общий пул
+      соединений клиента;
+    * одинаковые адреса скачиваются один раз;
+    * недокачанный файл хранится с расширением .part и при повторном
+      запуске докачивается запросом с заголовком Range.
+
+Usage::
+    >> photos = vk.api.photos.get(owner_id=1, album_id='wall', count=1000)
+    >> paths = Downloader(vk, 'photos', parallel=8).download(photos['items'])
+"""
+from .client import ClientError
+from .transports import TransportError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import posixpath
+import re
+import time
+import urllib.parse
+
+PHOTO_SIZE_KEY = re.compile(r'^photo_(\d+)$')
+
+# Типы размеров фотографий от меньшего к большему. Используются, если
+# width и height не указаны (у фотографий, загруженных до 2012 года)
+SIZE_TYPES = 'smopqrxyzw'
+
+
+def size_rank(size):
+    return (max(size.get('width') or 0, size.get('height') or 0),
+            SIZE_TYPES.find(size.get('type', '')))
+
+
+def best_size(sizes, max_size=None):
+    """Выбирает самый большой размер из массива sizes.
+
+    :param max_size: Ограничение большей стороны в пикселях. Если ни один
+        размер в него не укладывается, то выбирается самый маленький
+    :return: Элемент sizes или None, если у размеров нет адресов
+    """
+    sizes = [size for size in sizes if size.get('url') or size.get('src')]
+    if not sizes:
+        return None
+    if max_size is not None:
+        fitting = [size for size in sizes if size_rank(size)[0] <= max_size]
+        if not fitting:
+            return min(sizes, key=size_rank)
+        sizes = fitting
+    return max(sizes, key=size_rank)
+
+
+def legacy_sizes(photo):
+    """Размеры из полей photo_75 ... photo_2560, которые возвращаются
+    вместо sizes без параметра photo_sizes=1. Число в имени поля -
+    наибольшая сторона."""
+    sizes = []
+    for key, url in photo.items():
+        match = PHOTO_SIZE_KEY.match(key)
+        if match and url:
+            side = int(match.group(1))
+            sizes.append({'url': url, 'width': side, 'height': side})
+    return sizes
+
+
+def url_filename(url):
+    return posixpath.basename(urllib.parse.urlsplit(url).path) or 'file'
+
+
+def safe_filename(name):
+    return re.sub(r'[\\/:*?"<>|\x00-\x1f]', '_', name).strip(' .') or 'file'
+
+
+def resolve(item, max_size=None):
+    """Возвращает адрес и имя файла для объекта из ответа API.
+
+    :param item: Адрес, кортеж (адрес, имя файла), фотография, документ или
+        вложение вида {'type': 'photo', 'photo': {...}}
+    :rtype: tuple
+    """
+    if isinstance(item, str):
+        return item, url_filename(item)
+    if isinstance(item, tuple):
+        return item
+    if item.get('type') in item:
+        item = item[item['type']]
+    sizes = item.get('sizes') or legacy_sizes(item)
+    if sizes:
+        size = best_size(sizes, max_size)
+        if size is None:
+            raise ValueError("Photo has no sizes with url")
+        url = size.get('url') or size['src']
+        ext = posixpath.splitext(url_filename(url))[1] or '.jpg'
+        return url, '{}_{}{}'.format(item['owner_id'], item['id'], ext)
+    if item.get('url'):
+        if 'ext' in item:
+            name = '{}_{}.{}'.format(item['owner_id'], item['id'], item['ext'])
+        else:
+            name = url_filename(item['url'])
+        return item['url'], name
+    raise ValueError("Can't find url in {!r}".format(item))
+
+
+class Downloader:
+    """Скачивает файлы в каталог.
+
+    :param client: Клиент, через транспорт которого отправляются запросы
+    :type client: :class:`vkapi.client.Client`
+    :param directory: Каталог, создается при необходимости
+    :param parallel: Количество одновременных загрузок. Больше размера пула
+        транспорта задавать нет смысла
+    :param max_size: Ограничение большей стороны фотографий, см.
+        :func:`best_size`
+    :param chunk_size: Размер частей, которыми файл пишется на диск
+    :param progress: Функция progress(done, total), вызываемая после
+        скачивания каждого файла
+    """
+    def __init__(self, client, directory='.', parallel=8, max_size=None,
+                 chunk_size=64 * 1024, progress=None):
+        self.client = client
+        self.directory = directory
+        self.parallel = parallel
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.progress = progress
+
+    def plan(self, items):
+        """Сопоставляет объектам пути файлов.
+
+        :return: Пути по порядку объектов и словарь адрес - путь, в котором
+            каждый адрес встречается один раз
+        """
+        paths = []
+        unique = {}
+        taken = set()
+        for item in items:
+            url, name = resolve(item, self.max_size)
+            if url not in unique:
+                path = os.path.join(self.directory, safe_filename(name))
+                # Разные адреса с одинаковыми именами файлов
+                root, ext = os.path.splitext(path)
+                n = 1
+                while path in taken:
+                    path = '{}_{}{}'.format(root, n, ext)
+                    n += 1
+                taken.add(path)
+                unique[url] = path
+            paths.append(unique[url])
+        return paths, unique
+
+    def request_headers(self, part):
+        # Смещение в Range считается по несжатому содержимому
+        headers = {'Accept-Encoding': 'identity'}
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        if offset:
+            headers['Range'] = 'bytes={}-'.format(offset)
+        return headers, offset
+
+    def check_response(self, response, url, part, offset):
+        """Проверяет ответ и возвращает режим открытия файла .part или None,
+        если файл уже скачан целиком."""
+        content_range = response.headers.get('Content-Range', '')
+        if response.status == 416 and offset:
+            if content_range == 'bytes */{}'.format(offset):
+                return None
+            # Файл на сервере изменился
+            os.remove(part)
+            raise TransportError("Range not satisfiable for {}".format(url))
+        if response.status >= 500:
+            raise TransportError("Server error {} for {}".format(
+                response.status, url))
+        if response.status >= 400:
+            raise ClientError("Download of {} failed with status {}".format(
+                url, response.status))
+        if response.status == 206:
+            if not content_range.startswith('bytes {}-'.format(offset)):
+                os.remove(part)
+                raise TransportError(
+                    "Unexpected Content-Range {!r} for {}".format(
+                        content_range, url))
+            return 'ab'
+        # Сервер не поддерживает Range, скачиваем заново
+        return 'wb'
+
+    def fetch(self, url, part):
+        headers, offset = self.request_headers(part)
+        response = self.client.transport.request(
+            'GET', url, headers=self.client.merge_headers(headers),
+            stream=True)
+        try:
+            mode = self.check_response(response, url, part, offset)
+            if mode is None:
+                return
+            with open(part, mode) as fp:
+                for chunk in response.iter_content(self.chunk_size):
+                    fp.write(chunk)
+        finally:
+            response.close()
+
+    def download_file(self, url, path):
+        """Скачивает файл, повторяя запрос при ошибках соединения. Каждая
+        попытка продолжает с того места, где закончилась предыдущая.
+
+        :return: Путь к файлу
+        """
+        if os.path.exists(path):
+            return path
+        part = path + '.part'
+        policy = self.client.retry_policy
+        attempt = 0
+        while True:
+            try:
+                self.fetch(url, part)
+                break
+            except TransportError:
+                if attempt >= policy.retries:
+                    raise
+                time.sleep(policy.delay(attempt))
+                attempt += 1
+        os.replace(part, path)
+        return path
+
+    def download(self, items, return_exceptions=False):
+        """Скачивает файлы и возвращает пути к ним в порядке объектов.
+        Уже скачанные файлы пропускаются.
+
+        :param return_exceptions: Вернуть исключения на месте файлов,
+            которые не удалось скачать. Иначе после скачивания остальных
+            файлов выбрасывается первое из них
+        :rtype: list
+        """
+        paths, unique = self.plan(items)
+        os.makedirs(self.directory, exist_ok=True)
+        errors = {}
+        with ThreadPoolExecutor(self.parallel) as executor:
+            futures = {executor.submit(self.download_file, url, path): url
+                       for url, path in unique.items()}
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[unique[futures[future]]] = e
+                if self.progress is not None:
+                    self.progress(done, len(futures))
+        results = [errors.get(path, path) for path in paths]
+        if errors and not return_exceptions:
+            raise next(r for r in results if isinstance(r, Exception))
+        return results
@@ -10,6 +10,7 @@ TOO_MANY_REQUESTS_PER_SECOND = 6
 INVALID_REQUEST = 8
 FLOOD_CONTROL = 9
 INTERNAL_SERVER_ERROR = 10
+RUNTIME_ERROR = 13
 CAPTCHA_NEEDED = 14
 ACCESS_DENIED = 15
 HTTP_AUTHORIZATION_FAILED = 16
@@ -0,0 +1,99 @@
+"""Подготовка изображений перед загрузкой.
+
+ВКонтакте все равно пережимает фотографии, поэтому отправлять оригиналы с
+камеры по 10 Мб незачем: :class:`ImageResizer` уменьшает изображение до
+нужного размера и сжимает в JPEG. Это работа для процессора, поэтому
+:class:`vkapi.uploads.Uploader` выполняет ее в пуле процессов, пока потоки
+отправляют уже готовые файлы.
+
+Требует Pillow.
+
+Usage::
+    >> uploader = Uploader(vk, 'wall_photo', preprocess=True)
+    >> uploader = Uploader(vk, 'album_photo', album_id=1,
+    ..                     preprocess=ImageResizer(1280, quality=80))
+"""
+import io
+import mmap
+import os
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+FORMAT_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'WEBP': '.webp',
+}
+
+
+def read_image(file):
+    """Возвращает имя файла и путь или содержимое, которые можно передать
+    в другой процесс. Файловые объекты читаются целиком.
+
+    :param file: Путь, файловый объект, буфер или кортеж (имя файла, файл)
+    """
+    filename = None
+    if isinstance(file, tuple):
+        filename, file = file[:2]
+    if isinstance(file, (str, os.PathLike)):
+        path = os.fspath(file)
+        return filename or os.path.basename(path), path
+    if isinstance(file, (bytearray, memoryview, mmap.mmap)):
+        return filename, bytes(file)
+    if isinstance(file, bytes):
+        return filename, file
+    name = getattr(file, 'name', None)
+    if filename is None and isinstance(name, str):
+        filename = os.path.basename(name)
+    return filename, file.read()
+
+
+class ImageResizer:
+    """Уменьшает изображение так, чтобы большая сторона не превышала
+    max_size, и сжимает его. Поворот из EXIF применяется к пикселям, сами
+    метаданные не сохраняются.
+
+    Изображения, которые уже меньше max_size и записаны в нужном формате,
+    а также анимированные, отдаются без изменений.
+
+    Объект передается в другой процесс, поэтому хранит только настройки.
+
+    :param max_size: Максимальная длина большей стороны в пикселях
+    :param quality: Качество сжатия JPEG и WebP
+    :param format: Формат результата
+    """
+    def __init__(self, max_size=2560, quality=87, format='JPEG'):
+        if Image is None:
+            raise RuntimeError("ImageResizer requires Pillow")
+        self.max_size = max_size
+        self.quality = quality
+        self.format = format
+
+    def __call__(self, filename, source):
+        """Возвращает имя файла и содержимое подготовленного изображения.
+
+        :param source: Путь или содержимое файла
+        :rtype: tuple
+        """
+        fp = open(source, 'rb') if isinstance(source, str) else \
+            io.BytesIO(source)
+        with fp, Image.open(fp) as image:
+            if getattr(image, 'is_animated', False) or (
+                    max(image.size) <= self.max_size and
+                    image.format == self.format):
+                fp.seek(0)
+                return filename or 'image' + FORMAT_EXTENSIONS.get(
+                    image.format, ''), fp.read()
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((self.max_size, self.max_size), Image.LANCZOS)
+            if self.format == 'JPEG' and image.mode != 'RGB':
+                image = image.convert('RGB')
+            output = io.BytesIO()
+            image.save(output, self.format, quality=self.quality,
+                       optimize=True)
+        filename = os.path.splitext(filename or 'image')[0] + \
+            FORMAT_EXTENSIONS.get(self.format, '')
+        return filename, output.getvalue()
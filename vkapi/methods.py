@@ -0,0 +1,92 @@
+#
+# Классификация методов Api <https://vk.com/dev/methods>
+#
+import re
+
+# Методы, результат которых не зависит от владельца токена, если явно указан
+# объект запроса. Значение - параметры, один из которых должен быть передан,
+# иначе метод вернет данные текущего пользователя. None - метод всегда
+# возвращает одно и то же для любого токена.
+#
+# groups.getById сюда не входит: он всегда возвращает is_admin, is_member и
+# is_advertiser текущего пользователя.
+PUBLIC_METHODS = {
+    'board.getComments': ('group_id',),
+    'board.getTopics': ('group_id',),
+    'database.getChairs': None,
+    'database.getCities': None,
+    'database.getCitiesById': None,
+    'database.getCountries': None,
+    'database.getCountriesById': None,
+    'database.getFaculties': None,
+    'database.getRegions': None,
+    'database.getSchools': None,
+    'database.getUniversities': None,
+    'friends.get': ('user_id',),
+    'groups.getMembers': ('group_id',),
+    'likes.getList': ('owner_id',),
+    'photos.get': ('owner_id',),
+    'photos.getAlbums': ('owner_id',),
+    'photos.getAll': ('owner_id',),
+    'photos.getById': ('photos',),
+    'users.get': ('user_id', 'user_ids'),
+    'users.getFollowers': ('user_id',),
+    'users.getSubscriptions': ('user_id',),
+    'utils.checkLink': None,
+    'utils.getServerTime': None,
+    'utils.resolveScreenName': None,
+    'video.get': ('owner_id', 'videos'),
+    'wall.get': ('owner_id', 'domain'),
+    'wall.getById': ('posts',),
+    'wall.getComments': ('owner_id',),
+    'wall.getReposts': ('owner_id',),
+}
+
+# Поля пользователей и сообществ (параметр fields), значения которых
+# зависят от владельца токена
+VIEWER_FIELDS = frozenset([
+    'admin_level',
+    'blacklisted',
+    'blacklisted_by_me',
+    'can_access_closed',
+    'can_message',
+    'can_post',
+    'can_see_all_posts',
+    'can_see_audio',
+    'can_send_friend_request',
+    'can_write_private_message',
+    'common_count',
+    'friend_status',
+    'is_admin',
+    'is_advertiser',
+    'is_favorite',
+    'is_friend',
+    'is_hidden_from_feed',
+    'is_member',
+    'is_messages_blocked',
+    'is_subscribed',
+    'member_status',
+    'mutual',
+])
+
+READ_ONLY_REGEXP = re.compile(r"\.(get|search|is|are|resolve|check)([A-Z]|$)")
+
+
+def is_public(method, params):
+    """Проверяет, что результат вызова не зависит от владельца токена и
+    запрос можно отправить с любым токеном."""
+    if method not in PUBLIC_METHODS:
+        return False
+    required = PUBLIC_METHODS[method]
+    if required is not None and not any(params.get(p) for p in required):
+        return False
+    fields = params.get('fields') or ()
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    return not VIEWER_FIELDS.intersection(f.strip() for f in fields)
+
+
+def is_read_only(method):
+    """Проверяет, что метод ничего не изменяет и его можно безопасно
+    вызывать повторно."""
+    return method != 'execute' and bool(READ_ONLY_REGEXP.search(method))
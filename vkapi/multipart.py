@@ -0,0 +1,200 @@
+"""Потоковое кодирование multipart/form-data.
+
+Тело запроса не собирается в памяти целиком: :class:`MultipartEncoder`
+является файлоподобным объектом известной длины, и HTTP-библиотека читает
+его частями по мере отправки. Поэтому загрузка видео в несколько сотен
+мегабайт занимает в памяти только буфер сокета.
+
+Usage::
+    >> encoder = MultipartEncoder({'video_file': '/path/to/video.mp4'},
+    ..                            callback=lambda sent, total: print(sent))
+    >> requests.post(url, data=encoder,
+    ..               headers={'Content-Type': encoder.content_type})
+
+Файлом может быть путь, файловый объект, bytes, bytearray, memoryview или
+mmap, а также кортеж (имя файла, файл[, тип содержимого]).
+"""
+import mimetypes
+import mmap
+import os
+import uuid
+
+CRLF = b'\r\n'
+
+
+class BufferSource:
+    """Часть тела из буфера в памяти. Буфер не копируется целиком, а
+    отдается срезами."""
+    def __init__(self, data):
+        self.view = memoryview(data).cast('B')
+        self.offset = 0
+
+    def __len__(self):
+        return len(self.view)
+
+    def read(self, size):
+        chunk = self.view[self.offset:self.offset + size]
+        self.offset += len(chunk)
+        return bytes(chunk)
+
+    def close(self):
+        self.view.release()
+
+
+class FileSource:
+    """Часть тела из открытого файла, читается с текущей позиции до конца.
+
+    :param close_file: Закрыть файл после чтения (для файлов, открытых
+        самим кодировщиком)
+    """
+    def __init__(self, fp, close_file=False):
+        self.fp = fp
+        self.close_file = close_file
+        try:
+            position = fp.tell()
+            self.length = fp.seek(0, os.SEEK_END) - position
+            fp.seek(position)
+        except (AttributeError, OSError) as e:
+            raise ValueError(
+                "Can't determine size of {!r}".format(fp)) from e
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size):
+        return self.fp.read(size)
+
+    def close(self):
+        if self.close_file:
+            self.fp.close()
+
+
+class PathSource(FileSource):
+    """Файл по пути. Открывается при первом чтении, поэтому кодировщик с
+    множеством файлов не держит их открытыми одновременно."""
+    def __init__(self, path):
+        self.path = path
+        self.fp = None
+        self.close_file = True
+        self.length = os.path.getsize(path)
+
+    def read(self, size):
+        if self.fp is None:
+            self.fp = open(self.path, 'rb')
+        chunk = self.fp.read(size)
+        if not chunk:
+            self.close()
+        return chunk
+
+    def close(self):
+        if self.fp is not None:
+            self.fp.close()
+
+
+def make_source(value):
+    """Возвращает часть тела и имя файла, если его можно определить."""
+    if isinstance(value, (str, os.PathLike)):
+        path = os.fspath(value)
+        return PathSource(path), os.path.basename(path)
+    if isinstance(value, (bytes, bytearray, memoryview, mmap.mmap)):
+        return BufferSource(value), None
+    if hasattr(value, 'read'):
+        name = getattr(value, 'name', None)
+        return FileSource(value), \
+            os.path.basename(name) if isinstance(name, str) else None
+    raise TypeError("Unsupported file type: {!r}".format(type(value)))
+
+
+def quote(value):
+    # Как в браузерах (HTML5): кавычки и переводы строк экранируются, а
+    # остальные символы передаются в UTF-8
+    return value.replace('"', '%22').replace('\r', '%0D').replace(
+        '\n', '%0A')
+
+
+class MultipartEncoder:
+    """Тело запроса multipart/form-data, которое читается частями.
+
+    :param files: Словарь: имя поля - файл или кортеж
+        (имя файла, файл[, тип содержимого])
+    :param fields: Обычные поля формы
+    :param callback: Функция callback(sent, total), вызываемая после
+        чтения каждой части тела
+    :param chunk_size: Размер частей при итерации по кодировщику
+    """
+    def __init__(self, files, fields=None, boundary=None, callback=None,
+                 chunk_size=64 * 1024):
+        self.boundary = boundary or uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary={}'.format(
+            self.boundary)
+        self.callback = callback
+        self.chunk_size = chunk_size
+        self.parts = []
+        for name, value in (fields or {}).items():
+            self.add_part(name, BufferSource(str(value).encode('utf-8')))
+        for name, value in files.items():
+            if isinstance(value, tuple):
+                filename, source, content_type = (value + (None,))[:3]
+                source, _ = make_source(source)
+            else:
+                source, filename = make_source(value)
+                content_type = None
+            filename = filename or name
+            content_type = content_type or mimetypes.guess_type(
+                filename)[0] or 'application/octet-stream'
+            self.add_part(name, source, filename, content_type)
+        self.parts.append(BufferSource(
+            '--{}--\r\n'.format(self.boundary).encode('ascii')))
+        self.length = sum(map(len, self.parts))
+        self.sent = 0
+        self.index = 0
+
+    def add_part(self, name, source, filename=None, content_type=None):
+        header = '--{}\r\nContent-Disposition: form-data; name="{}"'.format(
+            self.boundary, quote(name))
+        if filename is not None:
+            header += '; filename="{}"'.format(quote(filename))
+        if content_type is not None:
+            header += '\r\nContent-Type: {}'.format(content_type)
+        header += '\r\n\r\n'
+        self.parts.append(BufferSource(header.encode('utf-8')))
+        self.parts.append(source)
+        self.parts.append(BufferSource(CRLF))
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.length - self.sent
+        chunks = []
+        while size > 0 and self.index < len(self.parts):
+            chunk = self.parts[self.index].read(size)
+            if chunk:
+                chunks.append(chunk)
+                size -= len(chunk)
+            else:
+                self.parts[self.index].close()
+                self.index += 1
+        data = b''.join(chunks)
+        self.sent += len(data)
+        if data and self.callback is not None:
+            self.callback(self.sent, self.length)
+        return data
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self):
+        for part in self.parts:
+            part.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,232 @@
+"""Постраничный обход списков.
+
+Методы, возвращающие списки (friends.get, wall.get, groups.getMembers и
+т.д.), отдают их частями: {"count": 1000, "items": [...]}. Следующая
+страница запрашивается либо по смещению (offset), либо по курсору
+(start_from/next_from, например, в newsfeed.get).
+
+Большие списки быстрее загружать через execute, который выполняет до 25
+вызовов метода за один запрос (см. :func:`iter_bulk`).
+"""
+from . import errors
+from .batch import MAX_CALLS
+from concurrent.futures import ThreadPoolExecutor
+import json
+
+# Ограничение на размер ответа execute
+EXECUTE_SIZE_LIMIT = 5 * 1024 * 1024
+
+
+class Pager:
+    """Хранит состояние обхода: параметры следующей страницы и признак
+    окончания списка.
+
+    :param params: Параметры метода. Если переданы offset или start_from, то
+        обход начнется с них
+    :param page_size: Размер страницы (параметр count)
+    """
+    def __init__(self, params, page_size):
+        self.params = dict(params)
+        self.params['count'] = page_size
+        self.offset = self.params.get('offset', 0)
+        # Обход по курсору: список, однажды вернувший next_from, дальше
+        # листается только по нему
+        self.cursor = 'start_from' in self.params
+        self.done = False
+
+    def next_params(self):
+        return dict(self.params)
+
+    def items(self, page):
+        """Возвращает элементы страницы и сдвигает курсор."""
+        if isinstance(page, list):
+            items = page
+            count = None
+        else:
+            items = page.get('items', [])
+            count = page.get('count')
+        if not isinstance(page, list) and 'next_from' in page:
+            self.cursor = True
+        if self.cursor:
+            # На последней странице next_from пустой или отсутствует
+            next_from = None if isinstance(page, list) else \
+                page.get('next_from')
+            if next_from and items:
+                self.params['start_from'] = next_from
+            else:
+                self.done = True
+        else:
+            self.offset += len(items)
+            self.params['offset'] = self.offset
+            if not items or count is not None and self.offset >= count:
+                self.done = True
+        return items
+
+
+def iter_items(client, method, params, page_size=100, prefetch=True):
+    """Генератор, возвращающий элементы списка по одному.
+
+    Пока вызывающий код обрабатывает текущую страницу, следующая
+    загружается в фоновом потоке.
+
+    Usage::
+        >> for post in vk.api.wall.get.iter(owner_id=1, page_size=100):
+        ..     print(post.text)
+
+    :param client: Клиент или пул клиентов
+    :param method: Метод Api
+    :param params: Параметры метода
+    :param page_size: Количество элементов в одном запросе
+    :param prefetch: Загружать следующую страницу заранее
+    """
+    pager = Pager(params, page_size)
+    executor = ThreadPoolExecutor(1) if prefetch else None
+    try:
+        page = client.api_request(method, pager.next_params())
+        while True:
+            items = pager.items(page)
+            if pager.done:
+                yield from items
+                return
+            if executor:
+                future = executor.submit(
+                    client.api_request, method, pager.next_params())
+                yield from items
+                page = future.result()
+            else:
+                yield from items
+                page = client.api_request(method, pager.next_params())
+    finally:
+        if executor:
+            # Не ждем загрузки страницы, если обход прерван
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class BulkPager:
+    """Состояние загрузки списка через execute: за один запрос выполняется
+    до 25 вызовов метода с последовательными смещениями.
+
+    Количество страниц в одном execute подбирается так, чтобы ответ не
+    превышал ограничение на размер: размер элемента оценивается по
+    выборке из уже полученных элементов.
+
+    :param method: Метод Api
+    :param params: Параметры метода
+    :param page_size: Количество элементов на странице (параметр count)
+    :param pages_per_call: Максимальное количество страниц в одном execute
+    :param size_limit: Допустимый размер ответа в байтах
+    """
+    # Элементы, по которым оценивается размер ответа
+    SAMPLE_SIZE = 20
+
+    def __init__(self, method, params, page_size=1000, pages_per_call=25,
+                 size_limit=EXECUTE_SIZE_LIMIT):
+        if not 0 < pages_per_call <= MAX_CALLS:
+            raise ValueError("pages_per_call must be between 1 and {}".format(
+                MAX_CALLS))
+        self.method = method
+        self.params = dict(params)
+        self.offset = self.params.pop('offset', 0)
+        self.params['count'] = page_size
+        self.page_size = page_size
+        self.max_pages = pages_per_call
+        self.pages = pages_per_call
+        self.size_limit = size_limit
+        self.done = False
+        self.failed = False
+
+    def code(self):
+        """Генерирует код на VKScript для следующих self.pages страниц.
+
+        Если вызов метода завершился ошибкой (вернул false), то загрузка
+        останавливается, и возвращаются уже полученные элементы, смещение
+        неудачной страницы и "failed": true.
+        """
+        # Параметры метода со смещением из переменной o
+        args = json.dumps(self.params, ensure_ascii=False)
+        call = "API.{}({}, \"offset\": o}})".format(self.method, args[:-1])
+        return (
+            "var o = {offset}; var end = o + {size};"
+            "var r = {call};"
+            "if (!r) {{ return {{\"items\": [], \"offset\": o, "
+            "\"failed\": true}}; }}"
+            "var count = r.count; var items = r.items;"
+            "o = o + {step};"
+            "while (o < end && o < count) {{"
+            "r = {call};"
+            "if (!r) {{ return {{\"count\": count, \"items\": items, "
+            "\"offset\": o, \"failed\": true}}; }}"
+            "items = items + r.items; o = o + {step};"
+            "}}"
+            "return {{\"count\": count, \"items\": items, \"offset\": o}};"
+        ).format(offset=self.offset, size=self.pages * self.page_size,
+                 step=self.page_size, call=call)
+
+    def items(self, result):
+        items = result['items']
+        self.offset = result['offset']
+        if result.get('failed'):
+            # Ошибка вызова внутри execute не возвращается, поэтому
+            # страница запрашивается отдельно, см. page_params
+            self.failed = True
+        elif not items or self.offset >= result['count']:
+            self.done = True
+        else:
+            self.adapt(items)
+        return items
+
+    def page_params(self):
+        """Параметры для повтора неудачной страницы отдельным вызовом."""
+        return dict(self.params, offset=self.offset)
+
+    def page_items(self, page):
+        """Элементы страницы, полученной по :meth:`page_params`."""
+        self.failed = False
+        self.offset += self.page_size
+        if not page['items'] or self.offset >= page['count']:
+            self.done = True
+        return page['items']
+
+    def adapt(self, items):
+        sample = items[:self.SAMPLE_SIZE]
+        item_size = len(json.dumps(sample, ensure_ascii=False)) / len(sample)
+        page_bytes = item_size * self.page_size
+        # Оставляем запас, так как элементы различаются по размеру
+        pages = int(self.size_limit * 0.75 / page_bytes)
+        self.pages = max(1, min(self.max_pages, pages))
+
+    def retry(self, error):
+        """Уменьшает количество страниц, если execute не смог вернуть
+        слишком большой ответ.
+
+        :return: Можно ли повторить запрос
+        """
+        if error.code == errors.RUNTIME_ERROR and self.pages > 1:
+            # Оценка размера не помогла, больше не превышаем это значение
+            self.pages //= 2
+            self.max_pages = self.pages
+            return True
+        return False
+
+
+def iter_bulk(client, method, params, page_size=1000, pages_per_call=25):
+    """Генератор, загружающий список через execute по 25 страниц за запрос.
+
+    Usage::
+        >> for user_id in vk.api.groups.getMembers.bulk(group_id=1):
+        ..     print(user_id)
+    """
+    from .client import ApiError
+    pager = BulkPager(method, params, page_size, pages_per_call)
+    while not pager.done:
+        try:
+            result = client.api_request('execute', {'code': pager.code()})
+        except ApiError as e:
+            if pager.retry(e):
+                continue
+            raise
+        yield from pager.items(result)
+        if pager.failed:
+            # Повтор вернет страницу или выбросит исключение с ошибкой
+            yield from pager.page_items(
+                client.api_request(method, pager.page_params()))
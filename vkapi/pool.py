@@ -0,0 +1,113 @@
+from . import errors
+from .client import Api, ApiError, ClientError
+from .methods import is_public
+import logging
+import threading
+import time
+
+
+class ClientPool:
+    """Пул клиентов с разными токенами.
+
+    Публичные методы чтения (см. :func:`vkapi.methods.is_public`)
+    отправляются через наименее загруженного клиента, поэтому пропускная
+    способность растет вместе с количеством токенов. Остальные методы
+    зависят от владельца токена и всегда вызываются через клиента-владельца.
+    Клиенты, токены которых перестали действовать, исключаются из пула.
+
+    Usage::
+        >> pool = ClientPool([Client(access_token=t) for t in tokens])
+        >> members = pool.api.groups.getMembers(group_id=1)
+
+    :param clients: Список клиентов
+    :param owner: Клиент, через которого вызываются методы, зависящие от
+        владельца токена. По умолчанию - первый из списка
+    """
+    def __init__(self, clients, owner=None):
+        self.logger = logging.getLogger('.'.join([
+            self.__class__.__module__, self.__class__.__name__]))
+        self.clients = list(clients)
+        if not self.clients:
+            raise ValueError("clients must not be empty")
+        self.owner = owner or self.clients[0]
+        if self.owner not in self.clients:
+            self.clients.append(self.owner)
+        self.lock = threading.Lock()
+        # Количество выполняющихся запросов и время последнего запроса
+        self.pending = {id(client): 0 for client in self.clients}
+        self.last_used = {id(client): 0 for client in self.clients}
+        self.batcher = None
+        self.api = self.create_api()
+
+    def create_api(self):
+        return Api(self)
+
+    def __len__(self):
+        return len(self.clients)
+
+    def choose(self, method, params):
+        """Выбирает клиента для вызова и помечает его занятым."""
+        with self.lock:
+            if not self.clients:
+                raise ClientError("No clients left in pool")
+            if is_public(method, params):
+                # Меньше всего ожидающих запросов, а при равенстве - дольше
+                # всех не использовался, то есть успел накопить запас лимита
+                client = min(self.clients, key=lambda c: (
+                    self.pending[id(c)], self.last_used[id(c)]))
+            elif self.owner in self.clients:
+                client = self.owner
+            else:
+                raise ClientError("Owner client was evicted from pool")
+            self.pending[id(client)] += 1
+            self.last_used[id(client)] = time.monotonic()
+            return client
+
+    def release(self, client):
+        with self.lock:
+            if id(client) in self.pending:
+                self.pending[id(client)] -= 1
+
+    def evict(self, client):
+        with self.lock:
+            if client in self.clients:
+                self.clients.remove(client)
+                self.logger.warning(
+                    "Client with user_id=%s evicted from pool", client.user_id)
+
+    def should_evict(self, error):
+        return isinstance(error, ApiError) and \
+            error.code == errors.USER_AUTHORIZATION_FAILED
+
+    def api_request(self, method, params={}):
+        """Делает запрос к Api через одного из клиентов пула.
+
+        Если токен выбранного клиента недействителен, то клиент исключается,
+        а публичный метод повторяется через другого клиента.
+        """
+        while True:
+            client = self.choose(method, params)
+            try:
+                return client.api_request(method, params)
+            except ApiError as e:
+                if not self.should_evict(e):
+                    raise
+                self.evict(client)
+                # Публичный метод повторяется через другого клиента, даже
+                # если недействителен токен владельца
+                if client is self.owner and not is_public(method, params):
+                    raise
+            finally:
+                self.release(client)
+
+    def api_stream(self, method, params={}, chunk_size=64 * 1024):
+        """Потоковый запрос через одного из клиентов пула, см.
+        :meth:`vkapi.client.Client.api_stream`. Клиент считается занятым,
+        пока генератор не исчерпан или не закрыт. Повтора через другого
+        клиента нет, так как часть элементов уже могла быть получена.
+        """
+        client = self.choose(method, params)
+        try:
+            yield from client.api_stream(method, params, chunk_size)
+        finally:
+            self.release(client)
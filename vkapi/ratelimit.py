@@ -0,0 +1,469 @@
+"""Ограничение частоты запросов к Api.
+
+Вконтакте разрешает не более 3 запросов в секунду с одним токеном
+пользователя (20 для серверных приложений) <https://vk.com/dev/api_requests>.
+
+Состояние ограничителя хранится в бекенде. Чтобы несколько процессов или
+серверов с одним токеном вместе не превышали лимит, им нужно передать
+общий бекенд:
+
+    * :class:`MemoryBackend` - внутри процесса (по умолчанию);
+    * :class:`FileBackend` - процессы на одном хосте, состояние хранится в
+      отображенном в память файле;
+    * :class:`CoordinatorBackend` - несколько серверов, состояние хранит
+      :class:`CoordinatorServer`.
+
+Usage::
+    >> backend = FileBackend('/var/run/vkapi.limits')
+    >> vk = Client(access_token=token,
+    ..             rate_limiter=RateLimiter(3, backend=backend))
+"""
+from . import errors
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+# Ошибки, после которых AdaptiveRateLimiter снижает частоту
+RATE_LIMIT_CODES = frozenset((
+    errors.TOO_MANY_REQUESTS_PER_SECOND, errors.FLOOD_CONTROL))
+
+
+def hash_key(key):
+    """Токены не должны попадать в файлы и передаваться по сети, поэтому
+    вместо них используется хеш."""
+    return hashlib.md5(str(key).encode('utf-8')).digest()
+
+
+def boot_id():
+    """Идентификатор текущей загрузки системы. После перезагрузки
+    time.monotonic отсчитывается заново, и сохраненные значения теряют
+    смысл."""
+    try:
+        with open('/proc/sys/kernel/random/boot_id', 'rb') as fp:
+            return hash_key(fp.read().strip())
+    except OSError:
+        # Время загрузки, округленное, чтобы не зависеть от подстройки часов
+        return hash_key(round(time.time() - time.monotonic(), -1))
+
+
+def gcra(tat, now, interval, tolerance):
+    """Один шаг GCRA (generic cell rate algorithm).
+
+    :param tat: Теоретическое время следующего запроса
+    :param now: Текущее время
+    :param interval: Интервал между запросами
+    :param tolerance: Насколько запрос может опередить tat (для burst)
+    :return: Кортеж из нового tat и времени ожидания
+    :rtype: tuple
+    """
+    tat = max(tat, now)
+    return tat + interval, max(0, tat - tolerance - now)
+
+
+class MemoryBackend:
+    """Хранит состояние в памяти процесса."""
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.tats = {}
+
+    def reserve(self, key, interval, tolerance):
+        with self.lock:
+            self.tats[key], delay = gcra(
+                self.tats.get(key, 0), self.clock(), interval, tolerance)
+        return delay
+
+
+class FileBackend:
+    """Хранит состояние в файле, общем для процессов одного хоста.
+
+    Файл содержит идентификатор загрузки системы и таблицу слотов
+    фиксированного размера (хеш ключа и tat), отображенную в память.
+    Изменение слота выполняется под блокировкой fcntl. Время берется из
+    time.monotonic, которое в Linux едино для всех процессов, но начинается
+    заново после перезагрузки, поэтому файл, оставшийся от прошлой
+    загрузки, очищается.
+
+    :param filename: Путь к файлу, создается при необходимости
+    :param slots: Количество токенов, которые могут использоваться
+        одновременно. Слоты неактивных токенов занимаются заново. Если файл
+        уже создан другим процессом, то используется его размер, иначе один
+        токен попадал бы в разные слоты
+    """
+    HEADER = struct.Struct('<16s')
+    SLOT = struct.Struct('<16sd')
+
+    def __init__(self, filename, slots=16384, clock=time.monotonic):
+        if fcntl is None:
+            raise RuntimeError("FileBackend requires fcntl")
+        self.logger = logging.getLogger('.'.join([
+            self.__class__.__module__, self.__class__.__name__]))
+        self.filename = filename
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            self.slots = self.init_file(slots)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.mmap = mmap.mmap(
+            self.fd, self.HEADER.size + self.slots * self.SLOT.size)
+
+    def init_file(self, slots):
+        """Проверяет файл под блокировкой и возвращает количество слотов."""
+        current = boot_id()
+        size = os.fstat(self.fd).st_size - self.HEADER.size
+        header = os.pread(self.fd, self.HEADER.size, 0)
+        if header == current and size > 0 and size % self.SLOT.size == 0:
+            return size // self.SLOT.size
+        # Новый файл или файл от прошлой загрузки
+        os.ftruncate(self.fd, 0)
+        os.ftruncate(self.fd, self.HEADER.size + slots * self.SLOT.size)
+        os.pwrite(self.fd, current, 0)
+        return slots
+
+    def find_slot(self, key, now):
+        """Ищет слот ключа (открытая адресация с линейным пробированием).
+
+        Если ключа нет, то занимается первый устаревший слот: его tat уже
+        наступил, и для GCRA он не отличается от пустого. Слоты не
+        освобождаются, поэтому цепочки проб не разрываются. Если все слоты
+        заняты активными ключами, то занимается слот с наименьшим tat:
+        ограничение для его ключа ненадолго сбросится, но запросы не
+        остановятся.
+        """
+        start = int.from_bytes(key[:8], 'little') % self.slots
+        stale = None
+        oldest, oldest_tat = None, None
+        for i in range(self.slots):
+            offset = self.HEADER.size + \
+                (start + i) % self.slots * self.SLOT.size
+            slot_key, tat = self.SLOT.unpack_from(self.mmap, offset)
+            if slot_key == key:
+                return offset, tat
+            if slot_key == bytes(16):
+                return offset if stale is None else stale, 0
+            if stale is None and tat <= now:
+                stale = offset
+            if oldest is None or tat < oldest_tat:
+                oldest, oldest_tat = offset, tat
+        if stale is None:
+            self.logger.warning(
+                "All %d slots in %s are in use", self.slots, self.filename)
+            return oldest, 0
+        return stale, 0
+
+    def reserve(self, key, interval, tolerance):
+        key = hash_key(key)
+        # flock защищает от других процессов, но не от потоков, которые
+        # используют тот же дескриптор
+        with self.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                now = self.clock()
+                offset, tat = self.find_slot(key, now)
+                tat, delay = gcra(tat, now, interval, tolerance)
+                self.SLOT.pack_into(self.mmap, offset, key, tat)
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+        return delay
+
+    def close(self):
+        self.mmap.close()
+        os.close(self.fd)
+
+
+class CoordinatorBackend:
+    """Запрашивает время ожидания у :class:`CoordinatorServer`.
+
+    Время отсчитывается по часам сервера, поэтому синхронизировать часы
+    узлов не нужно. Каждый поток держит свое соединение.
+    """
+    def __init__(self, host='127.0.0.1', port=8470, timeout=5):
+        self.address = (host, port)
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def connect(self):
+        sock = socket.create_connection(self.address, self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.local.file = sock.makefile('rwb')
+        return self.local.file
+
+    def reserve(self, key, interval, tolerance):
+        line = "{} {!r} {!r}\n".format(
+            hash_key(key).hex(), interval, tolerance).encode('ascii')
+        # Одна повторная попытка на случай разорванного соединения
+        for attempt in range(2):
+            f = getattr(self.local, 'file', None)
+            try:
+                if f is None:
+                    f = self.connect()
+                f.write(line)
+                f.flush()
+                response = f.readline()
+                if not response:
+                    raise ConnectionError("Coordinator closed connection")
+                return float(response)
+            except OSError:
+                self.local.file = None
+                if attempt:
+                    raise
+
+
+class CoordinatorHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                key, interval, tolerance = line.split()
+                delay = self.server.backend.reserve(
+                    key, float(interval), float(tolerance))
+            except ValueError:
+                self.server.logger.warning("Bad request: %r", line)
+                return
+            self.wfile.write("{!r}\n".format(delay).encode('ascii'))
+
+
+class CoordinatorServer(socketserver.ThreadingTCPServer):
+    """Сервер, хранящий состояние ограничителей для нескольких узлов.
+
+    Usage::
+        $ python -m vkapi.ratelimit 0.0.0.0 8470
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 8470), backend=None):
+        self.logger = logging.getLogger('.'.join([
+            self.__class__.__module__, self.__class__.__name__]))
+        self.backend = backend or MemoryBackend()
+        super().__init__(address, CoordinatorHandler)
+
+
+class RateLimiter:
+    """Ограничитель частоты запросов по алгоритму token bucket.
+
+    Реализован как GCRA: вместо счетчика токенов для каждого ключа (токена
+    доступа) хранится одно число - теоретическое время следующего запроса.
+    Резервирование только сдвигает это время и возвращает, сколько нужно
+    подождать, поэтому блокировка удерживается на время пары
+    арифметических операций, а ожидание происходит вне ее.
+
+    Usage::
+        >> limiter = RateLimiter(rate=20, burst=5, concurrency=10)
+        >> vk = Client(rate_limiter=limiter)
+
+    :param rate: Количество запросов в секунду для одного ключа
+    :type rate: float
+    :param burst: Сколько запросов можно сделать подряд без ожидания.
+        Сервер считает запросы в скользящем окне, поэтому при burst > 1
+        стоит уменьшить rate
+    :type burst: int
+    :param concurrency: Максимальное количество одновременно выполняющихся
+        запросов для одного ключа в этом процессе (None - без ограничений)
+    :type concurrency: int
+    :param backend: Хранилище состояния, по умолчанию
+        :class:`MemoryBackend`
+    """
+    def __init__(self, rate, burst=1, concurrency=None, backend=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.backend = backend or MemoryBackend()
+        self.lock = threading.Lock()
+        self.semaphores = {}
+        self.async_semaphores = {}
+
+    def reserve(self, key=None):
+        """Резервирует время для запроса.
+
+        :return: Сколько секунд нужно подождать перед отправкой запроса
+        :rtype: float
+        """
+        interval = 1 / self.rate
+        return self.backend.reserve(
+            key, interval, (self.burst - 1) * interval)
+
+    def acquire(self, key=None):
+        """Блокирует поток, пока не наступит время для запроса."""
+        delay = self.reserve(key)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self, key=None):
+        """Асинхронный аналог :meth:`acquire`."""
+        delay = self.reserve(key)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def feedback(self, key=None, error=None):
+        """Сообщает ограничителю результат запроса: error равен None при
+        успехе или содержит исключение. Обычный ограничитель работает с
+        постоянной частотой и результат не использует, см.
+        :class:`AdaptiveRateLimiter`."""
+
+    def semaphore(self, key):
+        with self.lock:
+            if key not in self.semaphores:
+                self.semaphores[key] = threading.BoundedSemaphore(
+                    self.concurrency)
+            return self.semaphores[key]
+
+    def async_semaphore(self, key):
+        if key not in self.async_semaphores:
+            self.async_semaphores[key] = asyncio.Semaphore(self.concurrency)
+        return self.async_semaphores[key]
+
+    def slot(self, key=None):
+        """Возвращает контекстный менеджер, который ждет своей очереди и
+        занимает место среди одновременно выполняющихся запросов.
+
+        Usage::
+            >> with limiter.slot(access_token):
+            ..     response = send_request()
+        """
+        return Slot(self, key)
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """Ограничитель, который сам подбирает частоту запросов для каждого
+    ключа по алгоритму AIMD.
+
+    После каждого успешного запроса частота увеличивается на increase
+    запросов в секунду, а после ошибки "слишком много запросов" или flood
+    control умножается на decrease. Несколько запросов, отправленных до
+    снижения частоты, могут вернуть ошибку одновременно, поэтому повторно
+    частота снижается не раньше, чем через cooldown секунд. В результате
+    частота держится вблизи реального ограничения сервера.
+
+    Частота хранится в процессе, даже если бекенд общий: каждый процесс
+    подбирает ее сам. Ключи в :attr:`rates` - хеши токенов, как и в
+    бекендах, чтобы токены не попадали в метрики.
+
+    Usage::
+        >> limiter = AdaptiveRateLimiter(3, max_rate=20)
+        >> vk = Client(rate_limiter=limiter)
+        >> limiter.rates
+        {'...': 7.4}
+
+    :param rate: Начальная частота
+    :param min_rate: Наименьшая частота
+    :param max_rate: Наибольшая частота
+    :param increase: Прибавка к частоте после успешного запроса
+    :param decrease: Множитель частоты после ошибки
+    :param cooldown: Минимальный интервал между снижениями частоты
+    """
+    def __init__(self, rate, burst=1, concurrency=None, backend=None,
+                 min_rate=0.5, max_rate=20, increase=0.05, decrease=0.5,
+                 cooldown=1, clock=time.monotonic):
+        super().__init__(rate, burst, concurrency, backend)
+        if not 0 < min_rate <= rate <= max_rate:
+            raise ValueError("rate must be between min_rate and max_rate")
+        if not 0 < decrease < 1:
+            raise ValueError("decrease must be between 0 and 1")
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.clock = clock
+        self.rates = {}
+        self.decreased_at = {}
+
+    def rate_key(self, key):
+        return hash_key(key).hex()
+
+    def current_rate(self, key=None):
+        return self.rates.get(self.rate_key(key), self.rate)
+
+    def reserve(self, key=None):
+        interval = 1 / self.current_rate(key)
+        return self.backend.reserve(
+            key, interval, (self.burst - 1) * interval)
+
+    def feedback(self, key=None, error=None):
+        rate_key = self.rate_key(key)
+        if error is None:
+            with self.lock:
+                self.rates[rate_key] = min(
+                    self.max_rate, self.current_rate(key) + self.increase)
+        elif getattr(error, 'code', None) in RATE_LIMIT_CODES:
+            with self.lock:
+                now = self.clock()
+                if now - self.decreased_at.get(rate_key, -self.cooldown) < \
+                        self.cooldown:
+                    return
+                self.decreased_at[rate_key] = now
+                self.rates[rate_key] = max(
+                    self.min_rate, self.current_rate(key) * self.decrease)
+
+
+class Slot:
+    def __init__(self, limiter, key):
+        self.limiter = limiter
+        self.key = key
+        self.semaphore = None
+
+    def __enter__(self):
+        if self.limiter.concurrency:
+            self.semaphore = self.limiter.semaphore(self.key)
+            self.semaphore.acquire()
+        try:
+            self.limiter.acquire(self.key)
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.semaphore:
+            self.semaphore.release()
+
+    async def __aenter__(self):
+        if self.limiter.concurrency:
+            self.semaphore = self.limiter.async_semaphore(self.key)
+            await self.semaphore.acquire()
+        try:
+            await self.limiter.acquire_async(self.key)
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.__exit__(exc_type, exc_value, traceback)
+
+
+if __name__ == '__main__':
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    host = sys.argv[1] if len(sys.argv) > 1 else '127.0.0.1'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8470
+    with CoordinatorServer((host, port)) as server:
+        server.logger.info("Listening on %s:%d", host, port)
+        server.serve_forever()
@@ -0,0 +1,140 @@
+"""Компактные типизированные записи для основных объектов Api.
+
+Каждый объект, возвращаемый Api, по умолчанию является словарем. Записи
+хранят поля в __slots__, поэтому занимают в несколько раз меньше памяти,
+быстрее создаются и компактно сериализуются pickle. Поля, отсутствующие в
+ответе, равны None. Поля, не описанные в классе, сохраняются отдельно и
+тоже доступны через точку.
+
+Usage::
+    >> users = vk.api.users.get.typed(User)(user_ids='1,2', fields='sex')
+    >> users[0].first_name
+    'Павел'
+    >> for member in vk.api.groups.getMembers.typed(User).iter(
+    ..         group_id=1, fields='sex'):
+    ..     print(member.sex)
+
+Свои типы записей создаются наследованием от :class:`Record` с
+перечислением полей в __slots__.
+"""
+
+
+class Record:
+    __slots__ = ('_extra',)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        fields = []
+        for klass in reversed(cls.__mro__):
+            for name in klass.__dict__.get('__slots__', ()):
+                if name != '_extra':
+                    fields.append(name)
+        cls._fields = tuple(fields)
+        cls._field_set = frozenset(fields)
+
+    def __init__(self, **kwargs):
+        for name in self._fields:
+            setattr(self, name, kwargs.pop(name, None))
+        self._extra = kwargs or None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Создает запись из объекта, полученного от Api."""
+        obj = cls.__new__(cls)
+        get = data.get
+        for name in cls._fields:
+            setattr(obj, name, get(name))
+        obj._extra = {k: get(k) for k in data
+                      if k not in cls._field_set} or None
+        return obj
+
+    def __getattr__(self, name):
+        # Вызывается только для полей, не описанных в __slots__
+        if name != '_extra':
+            extra = self._extra
+            if extra and name in extra:
+                return extra[name]
+        raise AttributeError("{!r} object has no attribute {!r}".format(
+            self.__class__.__name__, name))
+
+    def to_dict(self):
+        """Возвращает поля записи (кроме пустых) в виде словаря."""
+        dct = {name: getattr(self, name) for name in self._fields
+               if getattr(self, name) is not None}
+        if self._extra:
+            dct.update(self._extra)
+        return dct
+
+    @classmethod
+    def _restore(cls, values, extra):
+        obj = cls.__new__(cls)
+        for name, value in zip(cls._fields, values):
+            setattr(obj, name, value)
+        obj._extra = extra
+        return obj
+
+    def __reduce__(self):
+        # Кортеж значений без имен полей занимает меньше всего места
+        return self._restore, (
+            tuple(getattr(self, name) for name in self._fields), self._extra)
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.__reduce__()[1] == other.__reduce__()[1]
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, ", ".join(
+            "{}={!r}".format(k, v) for k, v in self.to_dict().items()))
+
+
+class User(Record):
+    """<https://vk.com/dev/objects/user>"""
+    __slots__ = ('id', 'first_name', 'last_name', 'deactivated', 'hidden',
+                 'sex', 'bdate', 'city', 'country', 'domain', 'screen_name',
+                 'nickname', 'photo_50', 'photo_100', 'photo_200', 'online',
+                 'last_seen', 'followers_count', 'verified')
+
+
+class Group(Record):
+    """<https://vk.com/dev/objects/group>"""
+    __slots__ = ('id', 'name', 'screen_name', 'is_closed', 'deactivated',
+                 'type', 'is_admin', 'is_member', 'photo_50', 'photo_100',
+                 'photo_200', 'members_count', 'description', 'city',
+                 'country', 'verified')
+
+
+class Post(Record):
+    """<https://vk.com/dev/objects/post>"""
+    __slots__ = ('id', 'owner_id', 'from_id', 'created_by', 'date', 'text',
+                 'reply_owner_id', 'reply_post_id', 'friends_only',
+                 'comments', 'likes', 'reposts', 'post_type', 'post_source',
+                 'attachments', 'geo', 'signer_id', 'copy_history',
+                 'is_pinned', 'marked_as_ads')
+
+
+class Message(Record):
+    """<https://vk.com/dev/objects/message>"""
+    __slots__ = ('id', 'user_id', 'from_id', 'peer_id', 'date', 'read_state',
+                 'out', 'title', 'body', 'text', 'geo', 'attachments',
+                 'fwd_messages', 'emoji', 'important', 'deleted', 'chat_id',
+                 'random_id')
+
+
+def convert(result, record_type):
+    """Превращает объекты в результате вызова метода в записи.
+
+    Поддерживаются списки объектов, объекты со списком в поле items
+    (значение count и прочие поля сохраняются) и одиночные объекты.
+    """
+    if isinstance(result, list):
+        return [record_type.from_dict(x) if isinstance(x, dict) else x
+                for x in result]
+    if isinstance(result, dict):
+        if isinstance(result.get('items'), list):
+            # Результат может лежать в кеше, поэтому не изменяем его
+            result = result.__class__(result)
+            result['items'] = convert(result['items'], record_type)
+            return result
+        return record_type.from_dict(result)
+    return result
@@ -0,0 +1,80 @@
+"""Повтор запросов при временных ошибках.
+
+Ошибки, после которых запрос имеет смысл повторить (превышена частота
+запросов, flood control, внутренняя ошибка сервера, обрыв соединения),
+повторяются с экспоненциально растущей задержкой. Задержка выбирается
+случайно от нуля до текущего предела (full jitter), поэтому клиенты,
+получившие ошибку одновременно, не повторяют запросы тоже одновременно.
+
+Повторяются только методы, которые ничего не изменяют
+(см. :func:`vkapi.methods.is_read_only`): повтор wall.post после обрыва
+соединения мог бы опубликовать запись дважды.
+
+Usage::
+    >> vk = Client(retry_policy=RetryPolicy(retries=10, budget=300))
+    >> vk = Client(retry_policy=RetryPolicy(retries=0))  # без повторов
+"""
+from . import errors
+from .methods import is_read_only
+import random
+
+RETRYABLE_CODES = frozenset([
+    errors.TOO_MANY_REQUESTS_PER_SECOND,
+    errors.FLOOD_CONTROL,
+    errors.INTERNAL_SERVER_ERROR,
+])
+
+
+class RetryPolicy:
+    """Определяет, какие ошибки повторять и сколько ждать перед повтором.
+
+    :param retries: Максимальное количество повторов одного вызова
+    :param backoff: Предел задержки перед первым повтором в секундах,
+        с каждым повтором он удваивается
+    :param max_backoff: Наибольший предел задержки
+    :param budget: Сколько секунд в сумме можно ждать повторов одного
+        вызова
+    :param codes: Коды ошибок Api, после которых запрос повторяется
+    :param methods: Дополнительные методы, которые можно повторять, хотя
+        их имя не похоже на метод чтения
+    """
+    def __init__(self, retries=5, backoff=0.5, max_backoff=30, budget=60,
+                 codes=RETRYABLE_CODES, methods=None, rng=None):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.budget = budget
+        self.codes = frozenset(codes)
+        self.methods = frozenset(methods or ())
+        self.random = rng or random.Random()
+
+    def is_idempotent(self, method):
+        return method in self.methods or is_read_only(method)
+
+    def is_retryable(self, error):
+        """Ошибки Api повторяются по коду, а ошибки соединения - всегда.
+        Какие исключения считаются ошибками соединения, решает клиент."""
+        from .client import ApiError
+        if isinstance(error, ApiError):
+            return error.code in self.codes
+        return True
+
+    def delay(self, attempt):
+        """Случайная задержка перед повтором с номером attempt (с нуля)."""
+        limit = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return self.random.uniform(0, limit)
+
+    def next_delay(self, method, error, attempt, waited):
+        """Возвращает задержку перед следующим повтором или None, если
+        вызов повторять не нужно.
+
+        :param attempt: Количество уже сделанных повторов
+        :param waited: Сколько секунд уже потрачено на ожидание повторов
+        """
+        if attempt >= self.retries or not self.is_idempotent(method) or \
+                not self.is_retryable(error):
+            return None
+        delay = self.delay(attempt)
+        if waited + delay > self.budget:
+            return None
+        return delay
@@ -0,0 +1,199 @@
+"""Потоковый разбор больших ответов.
+
+Вместо того чтобы дожидаться загрузки всего ответа и разбирать его целиком,
+:class:`StreamParser` получает ответ по частям и возвращает элементы массива
+response.items по мере их получения. В памяти одновременно находятся только
+еще не разобранная часть ответа и текущий элемент.
+
+Разбор служебной части ответа (до начала массива) выполняется посимвольно,
+а сами элементы и все, что не ведет к массиву, разбираются модулем json.
+"""
+from .datatypes import wrap
+import codecs
+import json
+import re
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Символы, которыми может продолжаться число
+NUMBER_TAIL = frozenset('.eE0123456789')
+
+
+class NeedMoreData(Exception):
+    pass
+
+
+class StreamParser:
+    """Инкрементальный парсер, извлекающий элементы массива по пути path.
+
+    Если по пути встречается массив раньше, чем путь закончился (например,
+    users.get возвращает в response сразу список), то возвращаются его
+    элементы. Если вместо response сервер вернул error, то она сохраняется в
+    атрибут error, а элементы не возвращаются.
+
+    Usage::
+        >> parser = StreamParser()
+        >> for chunk in chunks:
+        ..     for item in parser.feed(chunk):
+        ..         print(item)
+        >> parser.close()
+
+    :param path: Путь к массиву
+    :type path: tuple
+    """
+    def __init__(self, path=('response', 'items')):
+        self.path = path
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.final = False
+        self.state = 'start'
+        # Количество объектов на пути к массиву, в которые мы вошли
+        self.depth = 0
+        self.key = None
+        # Длина буфера, при которой стоит повторить разбор значения,
+        # которое не поместилось в буфер
+        self.retry_size = 0
+        self.error = None
+
+    @property
+    def done(self):
+        return self.state == 'done'
+
+    def feed(self, data):
+        """Добавляет часть ответа.
+
+        :param data: Очередная часть ответа
+        :type data: bytes
+        :return: Элементы массива, полученные полностью
+        :rtype: list
+        """
+        self.buf += self.decoder.decode(data)
+        return self.parse()
+
+    def close(self):
+        """Сообщает об окончании ответа и возвращает оставшиеся элементы."""
+        self.buf += self.decoder.decode(b'', final=True)
+        self.final = True
+        items = self.parse()
+        if not self.done:
+            raise ValueError("Unexpected end of JSON data")
+        return items
+
+    def parse(self):
+        items = []
+        if len(self.buf) < self.retry_size and not self.final:
+            return items
+        try:
+            while not self.done:
+                self.step(items)
+        except NeedMoreData:
+            pass
+        # Отбрасываем разобранную часть
+        self.buf = self.buf[self.pos:]
+        self.retry_size = max(0, self.retry_size - self.pos)
+        self.pos = 0
+        return items
+
+    def next_char(self):
+        self.pos = WHITESPACE.match(self.buf, self.pos).end()
+        if self.pos >= len(self.buf):
+            raise NeedMoreData
+        return self.buf[self.pos]
+
+    def expect(self, char):
+        if self.next_char() != char:
+            raise ValueError("Expected {!r} at position {}".format(
+                char, self.pos))
+        self.pos += 1
+
+    def decode_value(self):
+        self.next_char()
+        try:
+            value, end = self.json.raw_decode(self.buf, self.pos)
+        except json.JSONDecodeError:
+            if self.final:
+                raise
+            # Значение пришло не полностью. Повторяем, когда буфер
+            # увеличится вдвое, чтобы не разбирать его заново на каждой части
+            self.retry_size = 2 * (len(self.buf) - self.pos) + self.pos
+            raise NeedMoreData
+        # Число в конце буфера могло быть обрезано, в том числе после точки
+        # или перед показателем степени: "2." разбирается как 2
+        if not self.final and (end == len(self.buf) or (
+                self.buf[end] in NUMBER_TAIL and
+                type(value) in (int, float))):
+            raise NeedMoreData
+        self.pos = end
+        return value
+
+    def step(self, items):
+        state = self.state
+        if state == 'start':
+            self.expect('{')
+            self.depth = 1
+            self.state = 'key'
+        elif state == 'key':
+            char = self.next_char()
+            if char == '}':
+                self.pos += 1
+                self.close_object()
+                return
+            if char != '"':
+                raise ValueError("Expected key at position {}".format(
+                    self.pos))
+            self.key = self.decode_value()
+            self.state = 'colon'
+        elif state == 'colon':
+            self.expect(':')
+            self.state = 'value'
+        elif state == 'value':
+            char = self.next_char()
+            if self.depth == 1 and self.key == 'error':
+                self.error = wrap(self.decode_value())
+                self.state = 'done'
+            elif self.key == self.path[self.depth - 1] and char == '[':
+                self.pos += 1
+                self.state = 'first_item'
+            elif self.key == self.path[self.depth - 1] and char == '{' \
+                    and self.depth < len(self.path):
+                self.pos += 1
+                self.depth += 1
+                self.state = 'key'
+            else:
+                self.decode_value()
+                self.state = 'after_value'
+        elif state == 'after_value':
+            char = self.next_char()
+            self.pos += 1
+            if char == ',':
+                self.state = 'key'
+            elif char == '}':
+                self.close_object()
+            else:
+                raise ValueError("Expected ',' or '}}' at position {}".format(
+                    self.pos - 1))
+        elif state == 'first_item':
+            if self.next_char() == ']':
+                self.pos += 1
+                self.state = 'done'
+            else:
+                self.state = 'item'
+        elif state == 'item':
+            items.append(wrap(self.decode_value()))
+            self.state = 'after_item'
+        elif state == 'after_item':
+            char = self.next_char()
+            self.pos += 1
+            if char == ',':
+                self.state = 'item'
+            elif char == ']':
+                # Остаток ответа не нужен
+                self.state = 'done'
+            else:
+                raise ValueError("Expected ',' or ']' at position {}".format(
+                    self.pos - 1))
+
+    def close_object(self):
+        self.depth -= 1
+        self.state = 'done' if self.depth == 0 else 'after_value'
@@ -0,0 +1,474 @@
+"""HTTP-транспорты.
+
+Клиент отправляет запросы через транспорт, поэтому HTTP-библиотеку можно
+выбрать под нагрузку:
+
+    * :class:`RequestsTransport` - requests (по умолчанию);
+    * :class:`Urllib3Transport` - urllib3 напрямую, без накладных расходов
+      requests на каждый запрос;
+    * :class:`AiohttpTransport` - aiohttp для :class:`vkapi.aio.AsyncClient`.
+
+Все транспорты принимают одинаковые настройки пула соединений, таймаутов и
+сжатия, а ошибки соединения превращают в :class:`TransportError`.
+
+Usage::
+    >> transport = Urllib3Transport(pool_size=20, read_timeout=10)
+    >> vk = Client(access_token=token, transport=transport)
+
+Один транспорт можно передать любому количеству клиентов: они будут
+использовать общий пул соединений, а токены, заголовки
+(см. параметр headers у :class:`vkapi.client.Client`) и ограничители
+частоты у каждого клиента останутся своими. Транспорты не хранят cookies,
+поэтому клиенты не получают чужих cookies через общий пул.
+
+    >> transport = Urllib3Transport(pool_size=50, block=True)
+    >> clients = [Client(access_token=t, transport=transport)
+    ..            for t in tokens]
+
+Сравнение на локальном сервере: benchmarks/bench_transports.py
+"""
+import asyncio
+import http.client
+import http.cookiejar
+import logging
+import os
+import threading
+import urllib.parse
+
+# aiohttp импортируется около 200 мс, а синхронному клиенту он не нужен,
+# поэтому загружается при создании AiohttpTransport, см. load_aiohttp
+aiohttp = None
+
+try:
+    import requests
+    import requests.adapters
+except ImportError:
+    requests = None
+
+try:
+    import urllib3
+except ImportError:
+    urllib3 = None
+
+
+class TransportError(OSError):
+    """Соединение не установлено, разорвано или истек таймаут. Такие
+    ошибки можно повторять, см. :mod:`vkapi.retry`."""
+
+
+class Response:
+    """Ответ сервера.
+
+    Если запрос отправлен со stream=True, то тело не загружается сразу, а
+    читается через :meth:`iter_content`, после чего ответ нужно закрыть.
+    """
+    def __init__(self, status, headers, content=None):
+        self.status = status
+        self.headers = headers
+        self.content = content
+
+    def iter_content(self, chunk_size):
+        yield self.content
+
+    def close(self):
+        pass
+
+
+def warmup_pool(pool, count, headers=None):
+    """Открывает до count соединений в пуле urllib3 и возвращает их в пул.
+
+    Соединения забираются из пула одновременно, поэтому открываются разные
+    соединения. Если передан headers, то по уже открытым соединениям
+    отправляется HEAD-запрос, чтобы сервер не закрыл их по таймауту
+    бездействия.
+
+    :return: Количество соединений, открытых заново
+    """
+    conns = []
+    opened = 0
+    try:
+        for _ in range(count):
+            conns.append(pool._get_conn())
+        for conn in conns:
+            if getattr(conn, 'sock', None) is not None and headers:
+                try:
+                    conn.request('HEAD', '/', headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    if response.headers.get('Connection') != 'close':
+                        continue
+                except (OSError, http.client.HTTPException):
+                    pass
+                conn.close()
+            if getattr(conn, 'sock', None) is None:
+                conn.connect()
+                opened += 1
+    except (OSError, urllib3.exceptions.HTTPError) as e:
+        for conn in conns:
+            conn.close()
+        raise TransportError(e) from e
+    finally:
+        for conn in conns:
+            pool._put_conn(conn)
+    return opened
+
+
+def file_name(fp, default):
+    name = getattr(fp, 'name', None)
+    return os.path.basename(name) if isinstance(name, str) else default
+
+
+class Transport:
+    """Общие настройки транспортов.
+
+    :param pool_size: Количество соединений, которые держатся открытыми
+        для одного хоста
+    :param max_hosts: Для скольких хостов держать пулы соединений
+    :param block: Ждать освобождения соединения, если все соединения с
+        хостом заняты, вместо того чтобы открыть временное. Так количество
+        соединений строго ограничено pool_size
+    :param keep_alive: Использовать соединения повторно. Если False, то
+        соединение закрывается после каждого запроса
+    :param connect_timeout: Таймаут установки соединения в секундах
+    :param read_timeout: Таймаут ожидания данных от сервера
+    :param compress: Запрашивать сжатые ответы (gzip)
+    :param headers: Заголовки, добавляемые к каждому запросу
+    """
+    def __init__(self, pool_size=10, max_hosts=10, block=False,
+                 keep_alive=True, connect_timeout=10, read_timeout=60,
+                 compress=True, headers=None):
+        self.pool_size = pool_size
+        self.max_hosts = max_hosts
+        self.block = block
+        self.keep_alive = keep_alive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.compress = compress
+        self.headers = {
+            'Accept-Encoding': 'gzip, deflate' if compress else 'identity',
+        }
+        if not keep_alive:
+            self.headers['Connection'] = 'close'
+        self.headers.update(headers or {})
+
+    def merge_headers(self, headers):
+        if not headers:
+            return self.headers
+        merged = dict(self.headers)
+        merged.update(headers)
+        return merged
+
+    def request(self, method, url, params=None, data=None, files=None,
+                headers=None, stream=False):
+        """Отправляет запрос.
+
+        :param params: Параметры строки запроса
+        :param data: Параметры формы или тело запроса (bytes либо
+            файловый объект, например,
+            :class:`vkapi.multipart.MultipartEncoder`)
+        :param files: Файлы для multipart/form-data: имя поля - файловый
+            объект или кортеж (имя файла, содержимое[, тип])
+        :param stream: Не загружать тело ответа сразу
+        :rtype: :class:`Response`
+        """
+        raise NotImplementedError
+
+    def warmup(self, url, count=1, ping=False):
+        """Заранее открывает соединения с хостом из url (DNS, TCP и TLS),
+        чтобы первые запросы не тратили на это время.
+
+        :param count: Количество соединений, не больше pool_size
+        :param ping: Отправить HEAD-запрос по уже открытым соединениям,
+            чтобы они не закрылись из-за бездействия
+        :return: Количество соединений, открытых заново
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class KeepAlive(threading.Thread):
+    """Фоновый поток, который каждые interval секунд вызывает
+    :meth:`Transport.warmup` с ping=True: отправляет HEAD по открытым
+    соединениям и заново открывает закрытые сервером."""
+    def __init__(self, transport, url, count, interval):
+        super().__init__(daemon=True)
+        self.logger = logging.getLogger('.'.join([
+            self.__class__.__module__, self.__class__.__name__]))
+        self.transport = transport
+        self.url = url
+        self.count = count
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                opened = self.transport.warmup(self.url, self.count, True)
+            except TransportError as e:
+                self.logger.warning("Keep-alive ping failed: %s", e)
+            else:
+                self.logger.debug("Keep-alive ping, reopened %d", opened)
+
+    def stop(self):
+        self.stopped.set()
+
+
+class RequestsResponse(Response):
+    def __init__(self, response):
+        super().__init__(response.status_code, response.headers)
+        self.response = response
+
+    def iter_content(self, chunk_size):
+        try:
+            yield from self.response.iter_content(chunk_size)
+        except requests.RequestException as e:
+            raise TransportError(e) from e
+
+    def close(self):
+        self.response.close()
+
+
+class RequestsTransport(Transport):
+    """Транспорт на основе :class:`requests.Session`.
+
+    :param session: Готовая сессия. Ее адаптеры и cookies не изменяются,
+        поэтому настройки пула на нее не действуют
+    """
+    def __init__(self, session=None, **kwargs):
+        if requests is None:
+            raise RuntimeError("RequestsTransport requires requests")
+        super().__init__(**kwargs)
+        if session is None:
+            session = requests.Session()
+            session.cookies.set_policy(
+                http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=self.max_hosts, pool_maxsize=self.pool_size,
+                pool_block=self.block)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+    def request(self, method, url, params=None, data=None, files=None,
+                headers=None, stream=False):
+        try:
+            response = self.session.request(
+                method, url, params=params, data=data, files=files,
+                headers=self.merge_headers(headers), stream=stream,
+                timeout=(self.connect_timeout, self.read_timeout))
+            if stream:
+                return RequestsResponse(response)
+            return Response(
+                response.status_code, response.headers, response.content)
+        except (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            raise TransportError(e) from e
+
+    def get_pool(self, url):
+        adapter = self.session.get_adapter(url)
+        # Настройки берутся так же, как при отправке запроса, иначе пул
+        # (ключ которого зависит от настроек TLS) окажется другим
+        settings = self.session.merge_environment_settings(
+            url, {}, None, None, None)
+        if hasattr(adapter, 'get_connection_with_tls_context'):
+            # requests >= 2.32
+            request = requests.Request('HEAD', url).prepare()
+            return adapter.get_connection_with_tls_context(
+                request, settings['verify'], settings['proxies'],
+                settings['cert'])
+        return adapter.get_connection(url, settings['proxies'])
+
+    def warmup(self, url, count=1, ping=False):
+        headers = dict(self.session.headers, **self.headers) if ping else None
+        return warmup_pool(
+            self.get_pool(url), min(count, self.pool_size), headers)
+
+    def close(self):
+        self.session.close()
+
+
+class Urllib3Response(Response):
+    def __init__(self, response):
+        super().__init__(response.status, response.headers)
+        self.response = response
+
+    def iter_content(self, chunk_size):
+        try:
+            yield from self.response.stream(chunk_size)
+        except urllib3.exceptions.HTTPError as e:
+            raise TransportError(e) from e
+
+    def close(self):
+        self.response.release_conn()
+
+
+class Urllib3Transport(Transport):
+    """Транспорт на основе :class:`urllib3.PoolManager`.
+
+    Параметры формы кодируются заранее, а ответ читается без промежуточных
+    объектов requests, поэтому накладные расходы на запрос меньше.
+    """
+    def __init__(self, **kwargs):
+        if urllib3 is None:
+            raise RuntimeError("Urllib3Transport requires urllib3")
+        super().__init__(**kwargs)
+        self.session = urllib3.PoolManager(
+            num_pools=self.max_hosts,
+            maxsize=self.pool_size,
+            block=self.block,
+            retries=False,
+            timeout=urllib3.Timeout(
+                connect=self.connect_timeout, read=self.read_timeout))
+
+    def request(self, method, url, params=None, data=None, files=None,
+                headers=None, stream=False):
+        headers = self.merge_headers(headers)
+        if params:
+            url = '{}?{}'.format(url, urllib.parse.urlencode(params))
+        if files:
+            fields = dict(data or {})
+            for name, value in files.items():
+                if not isinstance(value, tuple):
+                    value = (file_name(value, name), value)
+                filename, content = value[:2]
+                if hasattr(content, 'read'):
+                    content = content.read()
+                fields[name] = (filename, content) + tuple(value[2:3])
+            body, content_type = urllib3.encode_multipart_formdata(fields)
+            headers = dict(headers, **{'Content-Type': content_type})
+        elif hasattr(data, 'read') or isinstance(data, (bytes, str)):
+            body = data
+        elif data is not None:
+            body = urllib.parse.urlencode(data)
+            headers = dict(headers, **{
+                'Content-Type': 'application/x-www-form-urlencoded'})
+        else:
+            body = None
+        try:
+            response = self.session.request(
+                method, url, body=body, headers=headers,
+                preload_content=not stream)
+        except urllib3.exceptions.HTTPError as e:
+            raise TransportError(e) from e
+        if stream:
+            return Urllib3Response(response)
+        return Response(response.status, response.headers, response.data)
+
+    def warmup(self, url, count=1, ping=False):
+        return warmup_pool(
+            self.session.connection_from_url(url),
+            min(count, self.pool_size), self.headers if ping else None)
+
+    def close(self):
+        self.session.clear()
+
+
+class AiohttpResponse(Response):
+    def __init__(self, response):
+        super().__init__(response.status, response.headers)
+        self.response = response
+
+    async def iter_content(self, chunk_size):
+        try:
+            async for chunk in self.response.content.iter_chunked(
+                    chunk_size):
+                yield chunk
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise TransportError(e) from e
+
+    def close(self):
+        self.response.release()
+
+
+async def read_async(fp, chunk_size=64 * 1024):
+    """Читает файловый объект частями в пуле потоков, чтобы чтение с диска
+    не блокировало event loop."""
+    loop = asyncio.get_event_loop()
+    while True:
+        chunk = await loop.run_in_executor(None, fp.read, chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def load_aiohttp():
+    global aiohttp
+    if aiohttp is None:
+        try:
+            import aiohttp
+        except ImportError:
+            raise RuntimeError("AiohttpTransport requires aiohttp") from None
+    return aiohttp
+
+
+class AiohttpTransport(Transport):
+    """Асинхронный транспорт на основе :class:`aiohttp.ClientSession`.
+
+    Метод :meth:`request` является корутиной. Сессия создается при первом
+    запросе, так как ее нужно создавать внутри event loop.
+    """
+    def __init__(self, **kwargs):
+        load_aiohttp()
+        super().__init__(**kwargs)
+        self.session = None
+
+    def create_session(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size * self.max_hosts,
+            limit_per_host=self.pool_size, force_close=not self.keep_alive)
+        timeout = aiohttp.ClientTimeout(
+            sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+        return aiohttp.ClientSession(
+            connector=connector, timeout=timeout, headers=self.headers,
+            cookie_jar=aiohttp.DummyCookieJar(), auto_decompress=True)
+
+    async def request(self, method, url, params=None, data=None, files=None,
+                      headers=None, stream=False):
+        if self.session is None:
+            self.session = self.create_session()
+        if files:
+            form = aiohttp.FormData(data or {})
+            for name, value in files.items():
+                if not isinstance(value, tuple):
+                    value = (file_name(value, name), value)
+                filename, content = value[:2]
+                form.add_field(name, content, filename=filename,
+                               content_type=(value[2:3] or (None,))[0])
+            data = form
+        elif hasattr(data, 'read'):
+            data = read_async(data)
+        try:
+            response = await self.session.request(
+                method, url, params=params, data=data, headers=headers)
+            if stream:
+                return AiohttpResponse(response)
+            async with response:
+                return Response(
+                    response.status, response.headers, await response.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise TransportError(e) from e
+
+    async def warmup(self, url, count=1, ping=False):
+        """Асинхронный аналог :meth:`Transport.warmup`. Соединения
+        открываются одновременными HEAD-запросами: пока запрос не завершен,
+        его соединение занято, и каждый следующий открывает новое. Запросы
+        отправляются и при ping=False, возвращается их количество."""
+        if self.session is None:
+            self.session = self.create_session()
+        count = min(count, self.pool_size)
+
+        async def head():
+            async with self.session.head(url):
+                pass
+        try:
+            await asyncio.gather(*(head() for _ in range(count)))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise TransportError(e) from e
+        return count
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
@@ -0,0 +1,556 @@
+"""Загрузка множества файлов.
+
+Загрузка файла состоит из трех шагов: получить адрес сервера загрузки
+(например, photos.getWallUploadServer), отправить на него файл и сохранить
+результат (photos.saveWallPhoto). :class:`Uploader` выполняет эти шаги для
+списка файлов:
+
+    * адрес сервера загрузки запрашивается один раз и используется, пока не
+      истечет url_ttl или сервер не вернет ошибку;
+    * файлы отправляются одновременно в нескольких потоках;
+    * вызовы save* по мере готовности файлов объединяются в execute по 25.
+
+Если задан dedupe, то файлы, которые уже загружались, повторно не
+отправляются: по SHA-256 содержимого в кеше ищется сохраненное ранее
+вложение. Найденные вложения проверяются одним вызовом getById, удаленные
+из кеша вычищаются и загружаются заново.
+
+Фотографии можно перед отправкой уменьшить в пуле процессов, см.
+:mod:`vkapi.images`.
+
+Большие файлы можно загружать частями с продолжением после обрыва, см.
+:class:`ResumableUpload`.
+
+Usage::
+    >> uploader = Uploader(vk, 'wall_photo', parallel=8)
+    >> attachments = uploader.upload(['1.jpg', '2.jpg', '3.jpg'])
+    >> vk.api.wall.post(attachments=','.join(attachments))
+
+    >> uploader = Uploader(vk, 'wall_photo', dedupe=SqliteCache('uploads.db'))
+"""
+from .batch import Batch, MAX_CALLS
+from .cache import MISSING
+from .client import ClientError
+from .images import ImageResizer, read_image
+from .multipart import quote
+from .ratelimit import hash_key
+from .transports import TransportError
+from concurrent.futures import (
+    Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed)
+import contextlib
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+import uuid
+
+
+class UploadKind:
+    """Описание загрузки одного типа.
+
+    :param server_method: Метод, возвращающий upload_url
+    :param field: Имя поля формы с файлом
+    :param save_method: Метод сохранения загруженного файла
+    :param attachment_type: Тип вложения (photo, doc и т.д.)
+    :param result_fields: Поля ответа сервера загрузки, которые передаются
+        в save_method
+    :param server_params: Параметры Uploader, которые передаются в
+        server_method
+    :param save_params: Параметры Uploader, которые передаются в save_method
+    :param check_method: Метод получения сохраненных объектов по
+        идентификаторам, через него проверяются вложения из кеша dedupe
+    :param check_param: Параметр check_method со списком идентификаторов
+    :param max_image_size: Размер большей стороны изображения при
+        подготовке с preprocess=True
+    """
+    def __init__(self, server_method, field, save_method, attachment_type,
+                 result_fields, server_params=(), save_params=(),
+                 check_method=None, check_param=None, max_image_size=None):
+        self.server_method = server_method
+        self.field = field
+        self.save_method = save_method
+        self.attachment_type = attachment_type
+        self.result_fields = result_fields
+        self.server_params = server_params
+        self.save_params = save_params
+        self.check_method = check_method
+        self.check_param = check_param
+        self.max_image_size = max_image_size
+
+
+KINDS = {
+    'wall_photo': UploadKind(
+        'photos.getWallUploadServer', 'photo', 'photos.saveWallPhoto',
+        'photo', ('server', 'photo', 'hash'),
+        ('group_id',), ('group_id', 'user_id', 'caption'),
+        'photos.getById', 'photos', 2560),
+    'album_photo': UploadKind(
+        'photos.getUploadServer', 'file1', 'photos.save', 'photo',
+        ('server', 'photos_list', 'hash'), ('album_id', 'group_id'),
+        ('album_id', 'group_id', 'caption'), 'photos.getById', 'photos',
+        2560),
+    'message_photo': UploadKind(
+        'photos.getMessagesUploadServer', 'photo',
+        'photos.saveMessagesPhoto', 'photo', ('server', 'photo', 'hash'),
+        check_method='photos.getById', check_param='photos',
+        max_image_size=1280),
+    'doc': UploadKind(
+        'docs.getUploadServer', 'file', 'docs.save', 'doc', ('file',),
+        ('group_id',), ('title', 'tags'), 'docs.getById', 'docs'),
+    'wall_doc': UploadKind(
+        'docs.getWallUploadServer', 'file', 'docs.save', 'doc', ('file',),
+        ('group_id',), ('title', 'tags'), 'docs.getById', 'docs'),
+}
+
+# Сколько вложений проверять одним вызовом getById
+CHECK_CHUNK_SIZE = 100
+
+
+def attachment(attachment_type, obj):
+    """Строка вложения вида photo1_2 или photo1_2_accesskey."""
+    parts = [obj['owner_id'], obj['id']]
+    if obj.get('access_key'):
+        parts.append(obj['access_key'])
+    return '{}{}'.format(attachment_type, '_'.join(map(str, parts)))
+
+
+def content_hash(file, chunk_size=1024 * 1024):
+    """SHA-256 содержимого файла в hex. Файловый объект после чтения
+    возвращается на прежнюю позицию.
+
+    :param file: Путь, файловый объект, буфер или кортеж (имя файла, файл)
+    """
+    if isinstance(file, tuple):
+        file = file[1]
+    digest = hashlib.sha256()
+    if isinstance(file, (bytes, bytearray, memoryview, mmap.mmap)):
+        digest.update(file)
+    elif isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as fp:
+            for chunk in iter(lambda: fp.read(chunk_size), b''):
+                digest.update(chunk)
+    else:
+        position = file.tell()
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+        file.seek(position)
+    return digest.hexdigest()
+
+
+class Uploader:
+    """Загружает файлы одного типа и возвращает строки вложений.
+
+    :param client: Клиент
+    :type client: :class:`vkapi.client.Client`
+    :param kind: Тип загрузки из :data:`KINDS` или :class:`UploadKind`
+    :param parallel: Количество одновременных загрузок
+    :param url_ttl: Сколько секунд использовать полученный upload_url
+    :param dedupe: Кеш загруженных файлов (хеш содержимого - вложение),
+        например, :class:`vkapi.cache.SqliteCache`
+    :type dedupe: :class:`vkapi.cache.BaseCache`
+    :param dedupe_ttl: Сколько секунд хранить вложение в кеше dedupe.
+        Срок продлевается при каждом повторном использовании
+    :param preprocess: Функция подготовки файла preprocess(filename,
+        source), которая выполняется в пуле процессов, например,
+        :class:`vkapi.images.ImageResizer`. True - уменьшать изображения до
+        размера, заданного для типа загрузки
+    :param processes: Размер пула процессов, по умолчанию - число
+        процессоров
+    :param params: Параметры методов получения сервера и сохранения,
+        например, group_id или caption
+    """
+    def __init__(self, client, kind='wall_photo', parallel=4, url_ttl=600,
+                 dedupe=None, dedupe_ttl=30 * 24 * 3600, preprocess=None,
+                 processes=None, clock=time.monotonic, **params):
+        self.client = client
+        self.kind = KINDS[kind] if isinstance(kind, str) else kind
+        self.parallel = parallel
+        self.url_ttl = url_ttl
+        self.clock = clock
+        self.params = params
+        self.dedupe = dedupe
+        self.dedupe_ttl = dedupe_ttl
+        if preprocess is True:
+            preprocess = ImageResizer(self.kind.max_image_size or 2560)
+        self.preprocess = preprocess
+        self.processes = processes
+        self.lock = threading.Lock()
+        self.url = None
+        self.url_expires = 0
+
+    def pick_params(self, names):
+        return {k: v for k, v in self.params.items() if k in names}
+
+    def get_upload_url(self):
+        """Возвращает действующий адрес сервера загрузки."""
+        with self.lock:
+            if self.url is None or self.clock() >= self.url_expires:
+                server = self.client.api_request(
+                    self.kind.server_method,
+                    self.pick_params(self.kind.server_params))
+                self.url = server['upload_url']
+                self.url_expires = self.clock() + self.url_ttl
+            return self.url
+
+    def invalidate_url(self, url):
+        with self.lock:
+            if self.url == url:
+                self.url = None
+
+    def upload_file(self, file):
+        """Отправляет файл на сервер загрузки. Если сервер вернул ошибку,
+        то адрес запрашивается заново и попытка повторяется один раз.
+
+        :param file: Файл или Future с подготовленным файлом
+        :return: Ответ сервера загрузки
+        """
+        if isinstance(file, Future):
+            file = file.result()
+        for attempt in range(2):
+            url = self.get_upload_url()
+            try:
+                result = self.client.upload(url, {self.kind.field: file})
+                if self.is_empty(result):
+                    raise ClientError("Upload server returned no file")
+                return result
+            except ClientError:
+                self.invalidate_url(url)
+                if attempt or not self.rewind(file):
+                    raise
+
+    def is_empty(self, result):
+        # Если файл не принят, то сервер возвращает пустое поле,
+        # например, "photo": "[]"
+        return any(result.get(name) in (None, '', '[]')
+                   for name in self.kind.result_fields)
+
+    def rewind(self, file):
+        """Возвращает файловый объект в начало перед повтором."""
+        if isinstance(file, tuple):
+            file = file[1]
+        if hasattr(file, 'seek'):
+            try:
+                file.seek(0)
+            except OSError:
+                return False
+        return True
+
+    def save_params(self, result):
+        params = {k: result[k] for k in self.kind.result_fields}
+        params.update(self.pick_params(self.kind.save_params))
+        return params
+
+    def to_attachment(self, saved):
+        if isinstance(saved, list):
+            saved = saved[0]
+        return attachment(self.kind.attachment_type, saved)
+
+    def save(self, ready, results):
+        """Сохраняет загруженные файлы через execute.
+
+        :param ready: Список пар (индекс файла, ответ сервера загрузки)
+        """
+        batch = Batch(self.client, MAX_CALLS)
+        futures = [(i, batch.add(self.kind.save_method,
+                                 self.save_params(result)))
+                   for i, result in ready]
+        batch.flush()
+        for i, future in futures:
+            try:
+                results[i] = self.to_attachment(future.result())
+            except Exception as e:
+                results[i] = e
+
+    def dedupe_scope(self):
+        """Владелец загруженных файлов. Если user_id неизвестен (клиент
+        создан только с access_token), то используется хеш токена, иначе
+        все такие клиенты с общим кешем получали бы чужие вложения."""
+        if self.client.user_id:
+            return 'user:{}'.format(self.client.user_id)
+        return 'token:{}'.format(hash_key(self.client.access_token).hex())
+
+    def dedupe_key(self, file):
+        # Вложение можно использовать повторно только от имени того же
+        # пользователя и с теми же параметрами (group_id, caption и т.д.)
+        params = dict(self.params, sha256=content_hash(file),
+                      uploader=self.dedupe_scope())
+        return self.dedupe.make_key(self.kind.save_method, params)
+
+    def find_duplicates(self, files):
+        """Ищет файлы в кеше dedupe.
+
+        :return: Ключи кеша по индексам файлов, найденные в кеше вложения и
+            повторы файлов внутри списка (индекс - индекс первого такого же
+            файла)
+        """
+        keys, hits, repeats = {}, {}, {}
+        first = {}
+        for i, file in enumerate(files):
+            key = keys[i] = self.dedupe_key(file)
+            if key in first:
+                repeats[i] = first[key]
+                continue
+            first[key] = i
+            value = self.dedupe.get(key)
+            if value is not MISSING:
+                hits[i] = value
+        return keys, hits, repeats
+
+    def check_chunks(self, attachments):
+        """Параметры вызовов check_method для списка вложений."""
+        prefix = len(self.kind.attachment_type)
+        ids = [value[prefix:] for value in attachments]
+        for i in range(0, len(ids), CHECK_CHUNK_SIZE):
+            yield {self.kind.check_param:
+                   ','.join(ids[i:i + CHECK_CHUNK_SIZE])}
+
+    def filter_existing(self, attachments, items):
+        found = {(item['owner_id'], item['id']) for item in items}
+        prefix = len(self.kind.attachment_type)
+        return {value for value in attachments if tuple(
+            map(int, value[prefix:].split('_')[:2])) in found}
+
+    def existing(self, attachments):
+        """Возвращает вложения, которые все еще существуют."""
+        attachments = sorted(set(attachments))
+        if not attachments or self.kind.check_method is None:
+            return set(attachments)
+        items = []
+        for params in self.check_chunks(attachments):
+            items.extend(self.client.api_request(
+                self.kind.check_method, params))
+        return self.filter_existing(attachments, items)
+
+    def reuse(self, keys, hits, existing, results):
+        """Подставляет найденные вложения и удаляет из кеша те, которых
+        больше нет."""
+        for i, value in hits.items():
+            if value in existing:
+                results[i] = value
+            else:
+                self.dedupe.delete(keys[i])
+
+    def remember(self, keys, repeats, results):
+        """Сохраняет вложения в кеш dedupe и копирует их повторам."""
+        for i, first in repeats.items():
+            results[i] = results[first]
+        for i, key in keys.items():
+            if i not in repeats and isinstance(results[i], str):
+                self.dedupe.set(key, results[i], self.dedupe_ttl)
+
+    @contextlib.contextmanager
+    def preprocessing(self):
+        """Возвращает функцию, которая отправляет файл на подготовку в пул
+        процессов и возвращает Future. Без preprocess файлы не меняются."""
+        if self.preprocess is None:
+            yield lambda file: file
+            return
+        with ProcessPoolExecutor(self.processes) as pool:
+            yield lambda file: pool.submit(
+                self.preprocess, *read_image(file))
+
+    def upload(self, files, return_exceptions=False):
+        """Загружает файлы и возвращает строки вложений в порядке файлов.
+
+        :param files: Список файлов: путей, файловых объектов, bytes или
+            кортежей (имя файла, файл), см.
+            :class:`vkapi.multipart.MultipartEncoder`
+        :param return_exceptions: Вернуть исключения на месте файлов,
+            которые не удалось загрузить. Иначе после загрузки остальных
+            файлов выбрасывается первое из них
+        :rtype: list
+        """
+        results = [None] * len(files)
+        keys, repeats = {}, {}
+        if self.dedupe is not None:
+            keys, hits, repeats = self.find_duplicates(files)
+            self.reuse(keys, hits, self.existing(hits.values()), results)
+        ready = []
+        # Все файлы сразу отправляются на подготовку, и потоки загружают их
+        # по мере готовности
+        with self.preprocessing() as prepare, \
+                ThreadPoolExecutor(self.parallel) as executor:
+            futures = {executor.submit(self.upload_file, prepare(file)): i
+                       for i, file in enumerate(files)
+                       if results[i] is None and i not in repeats}
+            # Сохраняем пачками, не дожидаясь загрузки всех файлов
+            for future in as_completed(futures):
+                try:
+                    ready.append((futures[future], future.result()))
+                except Exception as e:
+                    results[futures[future]] = e
+                if len(ready) == MAX_CALLS:
+                    self.save(ready, results)
+                    ready = []
+        if ready:
+            self.save(ready, results)
+        if self.dedupe is not None:
+            self.remember(keys, repeats, results)
+        if not return_exceptions:
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+        return results
+
+
+class ResumableUpload:
+    """Загрузка большого файла (например, видео после video.save) частями.
+
+    Каждая часть отправляется отдельным запросом с заголовками
+    Content-Range и Session-ID, поэтому при обрыве соединения повторяется
+    только одна часть. Номера принятых сервером частей сохраняются в файл
+    состояния: если процесс прервался, то новый ResumableUpload с тем же
+    state_file продолжит загрузку с того же места и по тому же адресу.
+
+    Части, кроме последней, можно отправлять одновременно (parallel > 1),
+    если сервер загрузки это допускает. Последняя часть всегда отправляется
+    после остальных, в ответ на нее сервер возвращает результат загрузки.
+
+    Usage::
+        >> upload = ResumableUpload(
+        ..     vk, 'movie.mp4', state_file='movie.mp4.upload',
+        ..     upload_url=lambda: vk.api.video.save(name='Movie').upload_url)
+        >> result = upload.run()
+        >> result.video_id
+
+    :param path: Путь к файлу
+    :param upload_url: Адрес загрузки или функция, которая его возвращает.
+        Функция вызывается, только если нет сохраненного состояния, чтобы
+        при продолжении загрузки не создавать новое видео
+    :param state_file: Файл состояния. Если не задан, то загрузку можно
+        продолжить только в этом же объекте
+    :param chunk_size: Размер части в байтах
+    :param parallel: Количество одновременно отправляемых частей
+    :param progress: Функция progress(sent, total)
+    """
+    def __init__(self, client, path, upload_url=None, state_file=None,
+                 chunk_size=4 * 1024 * 1024, parallel=1, progress=None):
+        self.client = client
+        self.path = path
+        self.state_file = state_file
+        self.parallel = parallel
+        self.progress = progress
+        self.lock = threading.Lock()
+        stat = os.stat(path)
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.state = self.load_state()
+        if self.state is None:
+            if callable(upload_url):
+                upload_url = upload_url()
+            self.state = {
+                'path': os.path.abspath(path),
+                'size': self.size,
+                'mtime': self.mtime,
+                'chunk_size': chunk_size,
+                'upload_url': upload_url,
+                'session_id': uuid.uuid4().hex,
+                'done': [],
+            }
+        self.chunk_size = self.state['chunk_size']
+        self.chunks = max(1, -(-self.size // self.chunk_size))
+
+    def load_state(self):
+        """Загружает состояние, если оно относится к этому же файлу."""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return None
+        with open(self.state_file, encoding='utf-8') as fp:
+            state = json.load(fp)
+        if state.get('size') != self.size or \
+                state.get('mtime') != self.mtime:
+            # Файл изменился, загружаем заново
+            return None
+        return state
+
+    def save_state(self):
+        if not self.state_file:
+            return
+        # Записываем во временный файл и переименовываем, чтобы при сбое
+        # не остался обрезанный файл состояния
+        temp = self.state_file + '.tmp'
+        with open(temp, 'w', encoding='utf-8') as fp:
+            json.dump(self.state, fp)
+        os.replace(temp, self.state_file)
+
+    @property
+    def sent(self):
+        done = set(self.state['done'])
+        return sum(self.chunk_range(i)[1] - self.chunk_range(i)[0] + 1
+                   for i in done)
+
+    def chunk_range(self, index):
+        start = index * self.chunk_size
+        return start, min(start + self.chunk_size, self.size) - 1
+
+    def read_chunk(self, index):
+        start, end = self.chunk_range(index)
+        with open(self.path, 'rb') as fp:
+            fp.seek(start)
+            return fp.read(end - start + 1)
+
+    def send_chunk(self, index):
+        """Отправляет часть, повторяя ее при ошибках соединения.
+
+        :return: Ответ сервера
+        """
+        start, end = self.chunk_range(index)
+        headers = {
+            'Content-Type': 'application/octet-stream',
+            'Content-Disposition': 'attachment; filename="{}"'.format(
+                quote(os.path.basename(self.path))),
+            'Content-Range': 'bytes {}-{}/{}'.format(start, end, self.size),
+            'Session-ID': self.state['session_id'],
+        }
+        data = self.read_chunk(index)
+        policy = self.client.retry_policy
+        attempt = 0
+        while True:
+            try:
+                response = self.client.transport.request(
+                    'POST', self.state['upload_url'], data=data,
+                    headers=self.client.merge_headers(headers))
+                if response.status >= 500:
+                    raise TransportError(
+                        "Upload server error {}".format(response.status))
+                break
+            except TransportError:
+                if attempt >= policy.retries:
+                    raise
+                time.sleep(policy.delay(attempt))
+                attempt += 1
+        if response.status >= 400:
+            raise ClientError("Chunk {}-{} rejected with status {}".format(
+                start, end, response.status))
+        with self.lock:
+            self.state['done'].append(index)
+            self.save_state()
+        if self.progress is not None:
+            self.progress(self.sent, self.size)
+        return response
+
+    def run(self):
+        """Отправляет оставшиеся части.
+
+        :return: Ответ сервера на последнюю часть
+        """
+        if not self.state['upload_url']:
+            raise ValueError("upload_url is required")
+        done = set(self.state['done'])
+        last = self.chunks - 1
+        pending = [i for i in range(last) if i not in done]
+        if self.parallel > 1:
+            with ThreadPoolExecutor(self.parallel) as executor:
+                # list() нужен, чтобы получить исключения
+                list(executor.map(self.send_chunk, pending))
+        else:
+            for index in pending:
+                self.send_chunk(index)
+        response = self.send_chunk(last)
+        result = self.client.decoder.decode(response.content)
+        if 'error' in result:
+            raise ClientError(result['error'])
+        if self.state_file and os.path.exists(self.state_file):
+            os.remove(self.state_file)
+        return result